@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Compact collection of isobands stored in flat arrays.
+
+The rings of all the polygons are stored in one array of (x, y, z) points
+with offset arrays (ragged layout): the points of the ring i are
+``coords[ring_offsets[i]:ring_offsets[i + 1]]`` and the rings of the polygon
+j are ``ring_offsets[poly_offsets[j]:poly_offsets[j + 1]]`` (exterior ring
+first). The rings are stored without their closing point.
+
+The shapely objects are only created on demand, so the collection can be
+held, sliced and pickled with a fraction of the memory of a list of Isoband.
+
+The coordinates can be stored in float32, relative to an origin (the 1st
+point) kept in float64: the error of a coordinate is then at most 2**-24 of
+its distance to the origin, i.e. of the extent of the polygons.
+"""
+
+
+from array import array
+import numpy
+from .marchingsquares import Isoband
+from .vectorized import expand
+
+
+class IsobandCollection:
+    """Compact collection of isobands with their band index."""
+
+    def __init__(self, coords, ring_offsets, poly_offsets, bands, levels,
+                 origin=None):
+        """Collection from its arrays.
+
+        :param coords: array of (x, y, z) points with (n, 3) shape, relative
+                       to origin (float32 or float64).
+        :param ring_offsets: array of the index of the 1st point of each ring,
+                             with the number of points at the end.
+        :param poly_offsets: array of the index of the 1st ring of each
+                             polygon, with the number of rings at the end.
+        :param bands: array of the index of the isoband of each polygon.
+        :param levels: sorted list of levels.
+        :param origin: (x, y, z) added to coords, or None for (0, 0, 0).
+        """
+        coords = numpy.asarray(coords)
+        if coords.dtype.kind != 'f':
+            coords = coords.astype(float)
+        self.coords = coords.reshape(-1, 3)
+        self.origin = numpy.zeros(3) if origin is None else \
+            numpy.asarray(origin, dtype=float)
+        self.ring_offsets = numpy.asarray(ring_offsets, dtype=numpy.int64)
+        self.poly_offsets = numpy.asarray(poly_offsets, dtype=numpy.int64)
+        self.bands = numpy.asarray(bands, dtype=numpy.int64)
+        self.levels = numpy.asarray(levels, dtype=float)
+
+    @classmethod
+    def from_polygons(cls, polys, levels, bands=None, dtype=float):
+        """Collection of polygons, read one by one.
+
+        :param polys: iterable of shapely Polygon with Z values (e.g. the
+                      generator of ``Pygonize.iter_isobands``).
+        :param levels: sorted list of levels.
+        :param bands: iterable of the index of the isoband of each polygon,
+                      or None to read it from the Isoband objects (or to find
+                      it from the Z values of the exterior ring of the other
+                      polygons).
+        :param dtype: type of the coordinates: float (float64) or
+                      numpy.float32 (relative to the 1st point).
+        :return: IsobandCollection object.
+        """
+        dtype = numpy.dtype(dtype)
+        if dtype not in (numpy.float32, numpy.float64):
+            raise ValueError("coordinates must be float32 or float64")
+        levels = numpy.asarray(sorted(levels), dtype=float)
+        coords = array('f' if dtype == numpy.float32 else 'd')
+        found, zmins, origin = array('q'), array('d'), None
+        ring_offsets, poly_offsets = array('q', [0]), array('q', [0])
+        for poly in polys:
+            for ring in [poly.exterior] + list(poly.interiors):
+                ps = ring.coords[:-1]
+                if origin is None and ps and dtype == numpy.float32:
+                    origin = ps[0]
+                for p in ps:
+                    if origin is not None:
+                        p = [a - b for a, b in zip(p, origin)]
+                    coords.extend(p)
+                ring_offsets.append(ring_offsets[-1] + len(ps))
+            poly_offsets.append(poly_offsets[-1] + len(poly.interiors) + 1)
+            if bands is None:
+                band = getattr(poly, 'band', None)
+                found.append(-1 if band is None else band)
+                zmins.append(numpy.nan if band is not None else
+                             min(p[2] for p in poly.exterior.coords))
+
+        if bands is None:
+            # band of the greatest level lower than or equal to the minimum
+            bands = numpy.frombuffer(found, dtype=numpy.int64)
+            bands = numpy.where(bands >= 0, bands, numpy.clip(
+                numpy.digitize(zmins, levels) - 1, 0,
+                max(len(levels) - 2, 0)))
+        else:
+            bands = numpy.fromiter(bands, dtype=numpy.int64)
+        return cls(numpy.frombuffer(coords, dtype=dtype),
+                   numpy.frombuffer(ring_offsets, dtype=numpy.int64),
+                   numpy.frombuffer(poly_offsets, dtype=numpy.int64), bands,
+                   levels, origin)
+
+    def __len__(self):
+        return len(self.bands)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.polygon(i)
+
+    def __getitem__(self, key):
+        """Polygon or sub-collection.
+
+        :param key: index of a polygon (returns an Isoband), or slice, array
+                    of index or boolean mask (returns an IsobandCollection).
+        """
+        if isinstance(key, (int, numpy.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("polygon index out of range")
+            return self.polygon(key)
+        return self.select(numpy.arange(len(self))[key])
+
+    def __repr__(self):
+        return '<IsobandCollection: {0} polygons, {1} points>'.format(
+            len(self), len(self.coords))
+
+    @property
+    def lvlmn(self):
+        """Get the minimum of the isoband of each polygon."""
+        return self.levels[self.bands]
+
+    @property
+    def lvlmx(self):
+        """Get the maximum of the isoband of each polygon."""
+        return self.levels[self.bands + 1]
+
+    @property
+    def nbytes(self):
+        """Get the memory used by the arrays, in bytes."""
+        return sum(a.nbytes for a in (self.coords, self.ring_offsets,
+                                      self.poly_offsets, self.bands,
+                                      self.levels, self.origin))
+
+    def rings(self, i):
+        """Rings of a polygon.
+
+        :param i: index of the polygon.
+        :return: list of arrays of (x, y, z) points, exterior ring first
+                 (views of coords without origin, float64 arrays otherwise).
+        """
+        r0, r1 = self.poly_offsets[i], self.poly_offsets[i + 1]
+        offsets = self.ring_offsets[r0:r1 + 1].tolist()
+        rings = [self.coords[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        if self.origin.any():
+            rings = [ring + self.origin for ring in rings]
+        return rings
+
+    def polygon(self, i):
+        """Shapely object of a polygon.
+
+        :param i: index of the polygon.
+        :return: Isoband object.
+        """
+        rings = [ring.tolist() for ring in self.rings(i)]
+        band = int(self.bands[i])
+        return Isoband(rings[0], rings[1:]).set_band(
+            float(self.levels[band]), float(self.levels[band + 1]), band)
+
+    def select(self, index):
+        """Sub-collection.
+
+        :param index: array of the index of the polygons.
+        :return: IsobandCollection object.
+        """
+        index = numpy.asarray(index, dtype=numpy.int64)
+        first = self.poly_offsets[index]
+        count = self.poly_offsets[index + 1] - first
+        rings = expand(first, count)[1]
+        first = self.ring_offsets[rings]
+        size = self.ring_offsets[rings + 1] - first
+        points = expand(first, size)[1]
+        return IsobandCollection(
+            self.coords[points], numpy.concatenate([[0], numpy.cumsum(size)]),
+            numpy.concatenate([[0], numpy.cumsum(count)]), self.bands[index],
+            self.levels, self.origin)
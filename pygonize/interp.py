@@ -1,33 +1,74 @@
-#!/usr/bin/env python3
-# coding: utf-8
-
-"""Linear interpolation."""
-
-
-from shapely.geometry import LineString
-
-
-def interpolate(p1, p2, lvl):
-    """Interpolate between two points from a level value.
-
-    :param p1: 1st point (shapely's PointZ object).
-    :param p2: 2nd point (shapely's PointZ object).
-    :param lvl: level value.
-    :return: point (shapely's PointZ object).
-    """
-    mn = min(p1.z, p2.z)
-    mx = max(p1.z, p2.z)
-
-    # Check
-    if lvl < mn:
-        return None
-    if lvl > mx:
-        return None
-
-    if p1.z < p2.z:
-        l = LineString((list(p1.coords)[0], list(p2.coords)[0]))
-    else:
-        l = LineString((list(p2.coords)[0], list(p1.coords)[0]))
-
-    dist = (lvl - mn) / (mx - mn)
-    return l.interpolate(dist, normalized=True)
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Linear interpolation."""
+
+
+import numpy
+from shapely.geometry import Point
+
+
+def interpolate_coords(ca, cb, za, zb, lvl):
+    """Interpolate a level on coordinates of edges, as arrays.
+
+    The interpolation is always done from the lowest to the highest point of
+    an edge, so the result does not depend on the direction of the edge. A
+    level equal to the value of a point gives exactly this point and a flat
+    edge gives its 1st point.
+
+    :param ca: coordinate of the 1st points of the edges.
+    :param cb: coordinate of the 2nd points of the edges.
+    :param za: Z values of the 1st points of the edges.
+    :param zb: Z values of the 2nd points of the edges.
+    :param lvl: level value (number or array).
+    :return: array of the coordinate of the interpolated points (the arrays
+             are broadcast together).
+    """
+    swap = za > zb
+    clo, chi = numpy.where(swap, cb, ca), numpy.where(swap, ca, cb)
+    zlo, zhi = numpy.where(swap, zb, za), numpy.where(swap, za, zb)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        c = clo + (lvl - zlo) / (zhi - zlo) * (chi - clo)
+    c = numpy.where(lvl == zhi, chi, c)  # exact end of the edge
+    return numpy.where(zlo == zhi, clo, c)  # flat edge
+
+
+def interpolate_array(pa, pb, lvl):
+    """Interpolate between couples of points from a level value, as arrays.
+
+    :param pa: 1st points as array of (x, y, z) with (n, 3) shape.
+    :param pb: 2nd points as array of (x, y, z) with (n, 3) shape.
+    :param lvl: level value (number or array with (n, ) shape).
+    :return: array of (x, y, z) with (n, 3) shape, NaN for the couples of
+             points without the level between their Z values.
+    """
+    pa, pb = numpy.asarray(pa, dtype=float), numpy.asarray(pb, dtype=float)
+    lvl = numpy.broadcast_to(numpy.asarray(lvl, dtype=float), pa.shape[:1])
+    za, zb = pa[:, 2], pb[:, 2]
+    out = interpolate_coords(pa[:, :2], pb[:, :2], za[:, None], zb[:, None],
+                             lvl[:, None])
+    out = numpy.column_stack([out, lvl])
+    outside = (lvl < numpy.minimum(za, zb)) | (lvl > numpy.maximum(za, zb))
+    out[outside] = numpy.nan
+    return out
+
+
+def interpolate(p1, p2, lvl):
+    """Interpolate between two points from a level value.
+
+    :param p1: 1st point (shapely's PointZ object).
+    :param p2: 2nd point (shapely's PointZ object).
+    :param lvl: level value.
+    :return: point (shapely's PointZ object).
+    """
+    mn = min(p1.z, p2.z)
+    mx = max(p1.z, p2.z)
+
+    # Check
+    if lvl < mn:
+        return None
+    if lvl > mx:
+        return None
+
+    p = interpolate_array([p1.coords[0]], [p2.coords[0]], lvl)[0]
+    return Point(p.tolist())
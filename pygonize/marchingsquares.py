@@ -4,41 +4,97 @@
 """Marching squares algorithm."""
 
 
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
 import numpy
-from shapely.geometry import Point, Polygon
-from .interp import interpolate
+from shapely.geometry import LineString, Point, Polygon
+from .interp import interpolate, interpolate_array
 
 
 class Isoband(Polygon):
     """Add methods and properties of shapely Polygon."""
 
+    band = None  # index of the isoband in the sorted levels
+    lvlmn = None  # minimum of the isoband value
+    lvlmx = None  # maximum of the isoband value
+    _z_limits = None
+
     def __init__(self, *args, **kwargs):
         """Isoband."""
         super().__init__(*args, **kwargs)
 
+    def __reduce__(self):
+        return (self.__class__, (),
+                (self.wkb, self.band, self.lvlmn, self.lvlmx))
+
+    def __setstate__(self, state):
+        wkb, band, lvlmn, lvlmx = state
+        super().__setstate__(wkb)
+        self.set_band(lvlmn, lvlmx, band)
+
+    def set_band(self, lvlmn, lvlmx, band=None):
+        """Set the isoband of the polygon.
+
+        :param lvlmn: minimum of the isoband value.
+        :param lvlmx: maximum of the isoband value.
+        :param band: index of the isoband in the sorted levels.
+        :return: the Isoband object itself.
+        """
+        self.lvlmn, self.lvlmx, self.band = lvlmn, lvlmx, band
+        return self
+
+    @property
+    def z_limits(self):
+        """Get minimal and maximal Z values of exterior ring."""
+        if self._z_limits is None:
+            zs = [pts[2] for pts in self.exterior.coords]
+            self._z_limits = (min(zs), max(zs))
+        return self._z_limits
+
     @property
     def z_min(self):
         """Get minimal Z value of exterior ring."""
-        return min([pts[2] for pts in list(self.exterior.coords)])
+        return self.z_limits[0]
 
     @property
     def z_max(self):
         """Get maximal Z value of exterior ring."""
-        return max([pts[2] for pts in list(self.exterior.coords)])
+        return self.z_limits[1]
+
+
+class Isoline(LineString):
+    """Add methods and properties of shapely LineString."""
+
+    def __init__(self, *args, **kwargs):
+        """Isoline."""
+        super().__init__(*args, **kwargs)
+
+    @property
+    def level(self):
+        """Get the level of the isoline (Z value of the points)."""
+        return self.coords[0][2]
 
 
 def remove_duplicate_point(lp):
-    """Remove duplicate point.
+    """Remove duplicate point, in linear time.
 
     :param lp: list of points (shapely's PointZ object).
-    :return: list of points (shapely's PointZ object).
+    :return: list of points (shapely's PointZ object), the 1st of the
+             duplicate points being kept.
+    """
+    out = dict()
+    for p in lp:
+        out.setdefault(p.coords[0], p)
+    return list(out.values())
+
+
+def remove_duplicate_coords(ps):
+    """Remove duplicate coordinates, in linear time.
+
+    :param ps: list of (x, y, z).
+    :return: list of (x, y, z), in the same order.
     """
-    lo = []
-    for p in lp:  # for each element...
-        if (p.x, p.y, p.z) not in lo:
-            lo.append((p.x, p.y, p.z))
-    out = [Point(x, y, z) for (x, y, z) in lo]
-    return out
+    return list(dict.fromkeys(ps))
 
 
 def get_idx_isoline(v, i):
@@ -126,18 +182,214 @@ def is_clockwise(p):
     return True
 
 
-def make_polygon(*ps):
+def make_polygon(*ps, clockwise=None):
     """Create polygon from a list of points.
 
     :param ps: list of shapely.geometry.Point
+    :param clockwise: orientation of the points if it is known (they are
+                      reversed if False), or None to check it.
     :return: Isoband object
     """
     if len(ps) < 3:
         return None
-    p = Isoband([e.coords[:][0] for e in ps])
-    if not is_clockwise(p):
-        p = Isoband(p.exterior.coords[::-1])
-    return p
+    if clockwise is None:
+        p = Isoband([e.coords[:][0] for e in ps])
+        if not is_clockwise(p):
+            p = Isoband(p.exterior.coords[::-1])
+        return p
+    if not clockwise:
+        ps = ps[:1] + ps[:0:-1]  # same 1st point
+    return Isoband([e.coords[:][0] for e in ps])
+
+
+def make_isoband(ps, clockwise=None):
+    """Create a clockwise isoband from a list of coordinates.
+
+    :param ps: list of (x, y, z).
+    :param clockwise: orientation of the coordinates if it is known (they are
+                      reversed if False), or None to check it.
+    :return: Isoband object or None.
+    """
+    if len(ps) < 3:
+        return None
+    if clockwise is None:
+        p = Isoband(ps)
+        if not is_clockwise(p):
+            p = Isoband(p.exterior.coords[::-1])
+        return p
+    return Isoband(ps if clockwise else ps[:1] + ps[:0:-1])
+
+
+def split_isoband(idx, ps, centralmean, lvlmn, lvlmx):
+    """Split the isoband points of a square into polygons.
+
+    Saddles cases are resolved with the central value of the square.
+
+    :param idx: ternary index of the square (see ``Square.isoband_classif``).
+    :param ps: list of the isoband points, without duplicate.
+    :param centralmean: central data value of the square.
+    :param lvlmn: minimum of the isoband value.
+    :param lvlmx: maximum of the isoband value.
+    :return: list of list of points (one list per polygon).
+    """
+    # saddles case, 6-sided
+    if idx == '0101' and not lvlmn <= centralmean <= lvlmx:
+        return [ps[0:3], ps[3:6]]
+
+    # saddles case, 6-sided
+    elif idx == '1010' and not lvlmn <= centralmean <= lvlmx:
+        return [[ps[0], ps[1], ps[5]], ps[2:5]]
+
+    # saddles case, 6-sided
+    elif idx == '2121' and not lvlmn <= centralmean <= lvlmx:
+        return [ps[0:3], ps[3:6]]
+
+    # saddles case, 6-sided
+    elif idx == '1212' and not lvlmn <= centralmean <= lvlmx:
+        return [[ps[0], ps[1], ps[5]], ps[2:5]]
+
+    # saddles case, 7-sided
+    elif idx == '2120' and not lvlmn <= centralmean <= lvlmx:
+        return [ps[0:3], ps[3:7]]
+
+    # saddles case, 7-sided
+    elif idx == '2021' and not lvlmn <= centralmean <= lvlmx:
+        return [ps[0:4], ps[4:7]]
+
+    # saddles case, 7-sided
+    elif idx == '1202' and not lvlmn <= centralmean <= lvlmx:
+        return [[ps[0], ps[1], ps[6]], ps[2:6]]
+
+    # saddles case, 7-sided
+    elif idx == '0212' and not lvlmn <= centralmean <= lvlmx:
+        return [[ps[0], ps[1], ps[5], ps[6]], ps[2:5]]
+
+    # saddles case, 7-sided
+    elif idx == '0102' and not lvlmn <= centralmean <= lvlmx:
+        return [ps[0:3], ps[3:7]]
+
+    # saddles case, 7-sided
+    elif idx == '0201' and not lvlmn <= centralmean <= lvlmx:
+        return [ps[0:4], ps[4:7]]
+
+    # saddles case, 7-sided
+    elif idx == '1020' and not lvlmn <= centralmean <= lvlmx:
+        return [[ps[0], ps[1], ps[6]], ps[2:6]]
+
+    # saddles case, 7-sided
+    elif idx == '2010' and not lvlmn <= centralmean <= lvlmx:
+        return [[ps[0], ps[1], ps[5], ps[6]], ps[2:5]]
+
+    # saddles case, 8-sided
+    elif idx == '2020' and centralmean < lvlmn:
+        return [[ps[0], ps[1], ps[6], ps[7]], ps[2:6]]
+
+    # saddles case, 8-sided
+    elif idx == '2020' and centralmean > lvlmx:
+        return [ps[0:4], ps[4:8]]
+
+    # saddles case, 8-sided
+    elif idx == '0202' and centralmean < lvlmn:
+        return [ps[0:4], ps[4:8]]
+
+    # saddles case, 8-sided
+    elif idx == '0202' and centralmean > lvlmx:
+        return [[ps[0], ps[1], ps[6], ps[7]], ps[2:6]]
+
+    else:  # regular case
+        return [ps]
+
+
+# Vertices of a square: the corners p1, p2, p3 and p4 (0 to 3) then, for each
+# edge, the points interpolated at the minimum and at the maximum of the
+# isoband (4 + 2 * edge and 5 + 2 * edge).
+SQUARE_EDGES = ((0, 1), (1, 2), (2, 3), (3, 0))
+
+IsobandCase = namedtuple('IsobandCase', ['idx', 'edges', 'polygons', 'saddle'])
+
+
+def isoband_case(code):
+    """Marching squares case of an isoband from its integer code.
+
+    The case gives, for each edge, the vertices of the isoband on the edge and
+    the polygons as list of vertices for a central value lower than, inside
+    and greater than the isoband (the saddles resolution rule).
+
+    :param code: ternary index read in base 3 (from 0 to 80).
+    :return: IsobandCase object.
+    """
+    cls = [code // 27, code // 9 % 3, code // 3 % 3, code % 3]
+    idx = "".join([str(e) for e in cls])
+
+    edges, ring = list(), list()
+    for ie, (a, b) in enumerate(SQUARE_EDGES):
+        if cls[a] == cls[b] and cls[a] != 1:
+            edges.append(())
+            continue
+        va = a if cls[a] == 1 else 4 + 2 * ie + cls[a] // 2
+        vb = b if cls[b] == 1 else 4 + 2 * ie + cls[b] // 2
+        edges.append((va, vb))
+        ring += [v for v in (va, vb) if v not in ring]
+
+    polygons = tuple()
+    if ring:
+        polygons = tuple(
+            tuple(tuple(part) for part in split_isoband(idx, ring, c, 1, 2))
+            for c in (0.5, 1.5, 2.5))
+    return IsobandCase(idx, tuple(edges), polygons, len(set(polygons)) > 1)
+
+
+# Cases of the marching squares algorithm for isobands
+CASES = tuple(isoband_case(code) for code in range(81))
+
+
+def saddle_index(centralmean, lvlmn, lvlmx):
+    """Index of the polygons of a case from the central value of a square.
+
+    :param centralmean: central data value of the square.
+    :param lvlmn: minimum of the isoband value.
+    :param lvlmx: maximum of the isoband value.
+    :return: 0 if lower than lvlmn, 2 if greater than lvlmx, 1 otherwise.
+    """
+    if centralmean < lvlmn:
+        return 0
+    if centralmean > lvlmx:
+        return 2
+    return 1
+
+
+IsolineCase = namedtuple('IsolineCase', ['idx', 'segments', 'saddle'])
+
+
+def isoline_case(code):
+    """Marching squares case of an isoline from its integer code.
+
+    The segments join the points of the isoline on two edges (as edge
+    index), for a central value lower than and greater than (or equal to)
+    the isoline. A segment goes from the edge leaving the values greater than
+    the isoline to the edge entering them, in the order of the corners: they
+    are oriented like the exterior rings of the isobands above the isoline.
+
+    :param code: binary index read in base 2 (from 0 to 15).
+    :return: IsolineCase object.
+    """
+    cls = [code // 8, code // 4 % 2, code // 2 % 2, code % 2]
+    idx = "".join([str(e) for e in cls])
+    downs = [ie for ie, (a, b) in enumerate(SQUARE_EDGES)
+             if cls[a] > cls[b]]
+    ups = [ie for ie, (a, b) in enumerate(SQUARE_EDGES) if cls[a] < cls[b]]
+
+    # With a central value lower than the isoline, the segments cut the
+    # corners greater than the isoline, otherwise the lower ones
+    segments = (tuple((d, min(ups, key=lambda u: (d - u) % 4))
+                      for d in downs),
+                tuple((d, min(ups, key=lambda u: (u - d) % 4))
+                      for d in downs))
+    return IsolineCase(idx, segments, segments[0] != segments[1])
+
+
+# Cases of the marching squares algorithm for isolines
+ISOLINE_CASES = tuple(isoline_case(code) for code in range(16))
 
 
 class SquareError(Exception):
@@ -147,7 +399,14 @@ class SquareError(Exception):
 
 
 class Square:
-    """Square."""
+    """Square.
+
+    The coordinates of the corners are kept as plain floats, the shapely
+    points are only created on demand (see ``points``).
+    """
+
+    __slots__ = ('coords', 'x', 'y', 'z', '_points', '_edges', '_clockwise',
+                 '_codes')
 
     def __init__(self, p1, p2, p3, p4):
         """Define a square with four points.
@@ -163,43 +422,60 @@ class Square:
         :param p4: lower-left point (shapely.geometry.Point object in 3d).
         :return:
         """
-        if not p1.has_z:
-            raise SquareError("p1 has no z coordinate.")
-        if not p2.has_z:
-            raise SquareError("p2 has no z coordinate.")
-        if not p3.has_z:
-            raise SquareError("p3 has no z coordinate.")
-        if not p4.has_z:
-            raise SquareError("p4 has no z coordinate.")
-
-        self.p1 = p1
-        self.p2 = p2
-        self.p3 = p3
-        self.p4 = p4
+        coords = list()
+        for name, p in zip(('p1', 'p2', 'p3', 'p4'), (p1, p2, p3, p4)):
+            c = p.coords[:]
+            if len(c) != 1 or len(c[0]) != 3:
+                raise SquareError("{0} has no z coordinate.".format(name))
+            coords.append(c[0])
+        self._set(coords, (p1, p2, p3, p4))
+
+    @classmethod
+    def from_coords(cls, c1, c2, c3, c4):
+        """Define a square with the coordinates of its four corners.
+
+        :param c1: upper-left corner as (x, y, z).
+        :param c2: upper-right corner as (x, y, z).
+        :param c3: lower-right corner as (x, y, z).
+        :param c4: lower-left corner as (x, y, z).
+        :return: Square object.
+        """
+        sq = cls.__new__(cls)
+        sq._set([tuple(map(float, c)) for c in (c1, c2, c3, c4)])
+        return sq
 
-    @property
-    def x(self):
-        """Get the X coordinates.
+    def _set(self, coords, points=None):
+        """Set the coordinates of the corners.
 
-        :return: list.
+        :param coords: list of the 4 corners as (x, y, z).
+        :param points: the 4 corners as shapely.geometry.Point or None.
         """
-        return self.p1.x, self.p2.x, self.p3.x, self.p4.x
+        self.coords = tuple(coords)
+        self.x, self.y, self.z = zip(*coords)
+        self._points = points
+        self._edges = None
+        self._clockwise = None  # orientation of the corners, once computed
+        self._codes = None  # codes of the isobands, by (lvlmn, lvlmx)
 
     @property
-    def y(self):
-        """Get the Y coordinates.
+    def p1(self):
+        """Get the upper-left point."""
+        return self.points[0]
 
-        :return: list.
-        """
-        return self.p1.y, self.p2.y, self.p3.y, self.p4.y
+    @property
+    def p2(self):
+        """Get the upper-right point."""
+        return self.points[1]
 
     @property
-    def z(self):
-        """Get the Z coordinates.
+    def p3(self):
+        """Get the lower-right point."""
+        return self.points[2]
 
-        :return:
-        """
-        return self.p1.z, self.p2.z, self.p3.z, self.p4.z
+    @property
+    def p4(self):
+        """Get the lower-left point."""
+        return self.points[3]
 
     @property
     def edges(self):
@@ -207,8 +483,10 @@ class Square:
 
         :return: list of (pi, pe).
         """
-        return [self.p1, self.p2], [self.p2, self.p3], [self.p3, self.p4], \
-               [self.p4, self.p1]
+        if self._edges is None:
+            p1, p2, p3, p4 = self.points
+            self._edges = [p1, p2], [p2, p3], [p3, p4], [p4, p1]
+        return self._edges
 
     @property
     def points(self):
@@ -216,7 +494,25 @@ class Square:
 
         :return: list of points.
         """
-        return self.p1, self.p2, self.p3, self.p4
+        if self._points is None:
+            self._points = tuple(Point(c) for c in self.coords)
+        return self._points
+
+    @property
+    def clockwise(self):
+        """Get the orientation of the corners.
+
+        The rings of the cases (see ``CASES``) have the orientation of the
+        corners: they are clockwise for X increasing from p1 to p2 and Y
+        decreasing from p1 to p4.
+
+        :return: boolean.
+        """
+        if self._clockwise is None:
+            x, y = self.x, self.y
+            self._clockwise = (x[1] - x[0]) * (y[3] - y[0]) - \
+                (y[1] - y[0]) * (x[3] - x[0]) < 0
+        return self._clockwise
 
     @property
     def centralmean(self):
@@ -224,7 +520,7 @@ class Square:
 
         :return: number.
         """
-        return numpy.array(self.z).mean()
+        return sum(self.z) / 4
 
     def isoband_classif(self, lvlmn, lvlmx):
         """Calculating the ternary index of the square to find isoband.
@@ -233,10 +529,45 @@ class Square:
         :param lvlmx: maximum of the isoband value.
         :return: string.
         """
-        idxp = list()
-        for p in self.points:
-            idxp.append(get_idx_isoband(p.z, lvlmn, lvlmx))
-        return "".join([str(e) for e in idxp])
+        return CASES[self.isoband_code(lvlmn, lvlmx)].idx
+
+    def isoband_code(self, lvlmn, lvlmx):
+        """Calculating the ternary index of the square as integer.
+
+        :param lvlmn: minimum of the isoband value.
+        :param lvlmx: maximum of the isoband value.
+        :return: integer from 0 to 80 (index of ``CASES``).
+        """
+        if self._codes is None:
+            self._codes = dict()
+        code = self._codes.get((lvlmn, lvlmx))
+        if code is None:
+            code = 0
+            for z in self.z:
+                code = code * 3 + get_idx_isoband(z, lvlmn, lvlmx)
+            self._codes[(lvlmn, lvlmx)] = code
+        return code
+
+    def vertices(self, vs, lvlmn, lvlmx):
+        """Get vertices of the square, the points on the edges being
+        interpolated at once (see ``interp.interpolate_array``).
+
+        :param vs: iterable of vertex index (from 0 to 11).
+        :param lvlmn: minimum of the isoband value.
+        :param lvlmx: maximum of the isoband value.
+        :return: dict of (x, y, z) by vertex index.
+        """
+        corners = self.coords
+        out = {v: corners[v] for v in vs if v < 4}
+        crossings = [v for v in vs if v >= 4]
+        if crossings:
+            lvls = sorted((lvlmn, lvlmx))
+            ies, ks = zip(*[divmod(v - 4, 2) for v in crossings])
+            ps = interpolate_array([corners[ie] for ie in ies],
+                                   [corners[(ie + 1) % 4] for ie in ies],
+                                   [lvls[k] for k in ks])
+            out.update(zip(crossings, map(tuple, ps.tolist())))
+        return out
 
     def vectorize_isoband(self, lvlmn, lvlmx):
         """Vectorization of one isoband.
@@ -245,100 +576,82 @@ class Square:
         :param lvlmx: maximum of the isoband value.
         :return: list of shapely.geometry.Polygon.
         """
-        idx = self.isoband_classif(lvlmn, lvlmx)
+        case = CASES[self.isoband_code(lvlmn, lvlmx)]
+        if not case.polygons:
+            return None
 
-        # Get points on the edge
-        ps = []
-        for pi, pe in self.edges:
-            ps += isoband_on_edge(pi, pe, lvlmn, lvlmx)
-
-        # Remove duplicate points
-        ps = remove_duplicate_point(ps)
+        isaddle = 1
+        if case.saddle:
+            isaddle = saddle_index(self.centralmean, lvlmn, lvlmx)
 
         # Create polygons
+        parts = case.polygons[isaddle]
+        vertices = self.vertices({v for part in parts for v in part}, lvlmn,
+                                 lvlmx)
+        clockwise = self.clockwise
+        polys = list()
+        for part in parts:
+            ps = remove_duplicate_coords([vertices[v] for v in part])
+            poly = make_isoband(ps, clockwise=clockwise)
+            if poly:
+                polys.append(poly.set_band(*sorted((lvlmn, lvlmx))))
+        return polys if polys else None
+
+    def isoline_code(self, lvl):
+        """Calculating the binary index of the square as integer.
+
+        :param lvl: level of the isoline.
+        :return: integer from 0 to 15 (index of ``ISOLINE_CASES``).
+        """
+        code = 0
+        for z in self.z:
+            code = code * 2 + get_idx_isoline(z, lvl)
+        return code
 
-        # saddles case, 6-sided
-        if idx == '0101' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(*ps[0:3]), make_polygon(*ps[3:6])]
-
-        # saddles case, 6-sided
-        elif idx == '1010' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(ps[0], ps[1], ps[5]), make_polygon(*ps[2:5])]
-
-        # saddles case, 6-sided
-        elif idx == '2121' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(*ps[0:3]), make_polygon(*ps[3:6])]
-
-        # saddles case, 6-sided
-        elif idx == '1212' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(ps[0], ps[1], ps[5]), make_polygon(*ps[2:5])]
-
-        # saddles case, 7-sided
-        elif idx == '2120' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(*ps[0:3]), make_polygon(*ps[3:7])]
-
-        # saddles case, 7-sided
-        elif idx == '2021' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(*ps[0:4]), make_polygon(*ps[4:7])]
-
-        # saddles case, 7-sided
-        elif idx == '1202' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(ps[0], ps[1], ps[6]), make_polygon(*ps[2:6])]
-
-        # saddles case, 7-sided
-        elif idx == '0212' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(ps[0], ps[1], ps[5], ps[6]),
-                    make_polygon(*ps[2:5])]
-
-        # saddles case, 7-sided
-        elif idx == '0102' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(*ps[0:3]), make_polygon(*ps[3:7])]
-
-        # saddles case, 7-sided
-        elif idx == '0201' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(*ps[0:4]), make_polygon(*ps[4:7])]
-
-        # saddles case, 7-sided
-        elif idx == '1020' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(ps[0], ps[1], ps[6]), make_polygon(*ps[2:6])]
-
-        # saddles case, 7-sided
-        elif idx == '2010' and not lvlmn <= self.centralmean <= lvlmx:
-            return [make_polygon(ps[0], ps[1], ps[5], ps[6]),
-                    make_polygon(*ps[2:5])]
-
-        # saddles case, 8-sided
-        elif idx == '2020' and self.centralmean < lvlmn:
-            return [make_polygon(ps[0], ps[1], ps[6], ps[7]),
-                    make_polygon(*ps[2:6])]
-
-        # saddles case, 8-sided
-        elif idx == '2020' and self.centralmean > lvlmx:
-            return [make_polygon(*ps[0:4]), make_polygon(*ps[4:8])]
-
-        # saddles case, 8-sided
-        elif idx == '0202' and self.centralmean < lvlmn:
-            return [make_polygon(*ps[0:4]), make_polygon(*ps[4:8])]
-
-        # saddles case, 8-sided
-        elif idx == '0202' and self.centralmean > lvlmx:
-            return [make_polygon(ps[0], ps[1], ps[6], ps[7]),
-                    make_polygon(*ps[2:6])]
+    def vectorize_isoline(self, lvl):
+        """Vectorization of one isoline.
 
-        else:  # regular case
-            poly = make_polygon(*ps)
-            return [poly] if poly else None
+        :param lvl: level of the isoline.
+        :return: list of segments (shapely.geometry.LineString) or None.
+        """
+        case = ISOLINE_CASES[self.isoline_code(lvl)]
+        icenter = 0
+        if case.saddle:
+            icenter = get_idx_isoline(self.centralmean, lvl)
+
+        segments = case.segments[icenter]
+        if not segments:
+            return None
+        edges = [e for segment in segments for e in segment]
+        corners = self.coords
+        ps = interpolate_array([corners[e] for e in edges],
+                               [corners[(e + 1) % 4] for e in edges],
+                               lvl).tolist()
+        lines = [LineString([pa, pb])
+                 for pa, pb in zip(ps[::2], ps[1::2]) if pa != pb]
+        return lines if lines else None
 
     def vectorize_isobands(self, levels):
         """Vectorization of isobands.
 
+        Only the isobands between the minimum and the maximum of the corners
+        are visited, the others have no polygon. A square with a missing
+        corner (NaN) has no polygon.
+
         :param levels: list of levels.
         :return: list of shapely.geometry.Polygon.
         """
+        levels = sorted(levels)
+        z = self.z
+        if any(v != v for v in z):  # NaN
+            return list()
+        first = max(bisect_right(levels, min(z)) - 1, 0)
+        last = min(bisect_left(levels, max(z)), len(levels) - 1)
         polys = list()
-        for lmn, lmx in zip(levels, levels[1:]):
+        for band in range(first, last):
+            lmn, lmx = levels[band], levels[band + 1]
             out = self.vectorize_isoband(lmn, lmx)
             if out is not None:
-                polys += out
+                polys += [poly.set_band(lmn, lmx, band) for poly in out]
             del out
         return polys
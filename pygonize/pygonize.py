@@ -4,27 +4,170 @@
 """Pygonize: polygonize raster data."""
 
 
+import collections
+import contextlib
 import math
 import multiprocessing
-from . import marchingsquares
+from . import marchingsquares, sharedgrid, vectorized
+from .collection import IsobandCollection
+from .pyramid import Pyramid
+from .raster import RasterBand, integer_nodata, masked_to_nan
+from .shpwriter import ShapefileWriter
 import numpy
 import rasterio
-from shapely.geometry import Point
-import shapefile
 import logging
 
 
 log = logging.getLogger(__name__)
 
 
-def vectorize_isoband_worker(wp1, wp2, wp3, wp4, wlevels):
-    """Function to be used by the multiprocessing module."""
-    fsq = marchingsquares.Square(wp1, wp2, wp3, wp4)
-    out = fsq.vectorize_isobands(wlevels)
-    del fsq
+def vectorize_isoband_strip_worker(wgrid, wstart, wend, wlevels,
+                                   wnodata=None):
+    """Function to be used by the multiprocessing module, for a strip of rows.
+
+    :param wgrid: description of the shared grid (see ``SharedGrid.spec``).
+    :param wstart: index of the 1st row of squares of the strip.
+    :param wend: index of the row of squares after the strip.
+    :param wlevels: list of levels.
+    :param wnodata: value of the missing cells of integer data, or None.
+    :return: list of polygons of the squares, from upper-left to lower-right.
+    """
+    out = list()
+    with sharedgrid.attach(wgrid) as (wx, wy, wz):
+        xs, ys = wx.tolist(), wy.tolist()
+        for iy in range(wstart, wend):
+            y1, y2 = ys[iy], ys[iy + 1]
+            z1, z2 = wz[iy].tolist(), wz[iy + 1].tolist()
+            for ix in range(len(xs) - 1):
+                zs = (z1[ix], z1[ix + 1], z2[ix + 1], z2[ix])
+                if math.isnan(sum(zs)) or wnodata in zs:
+                    continue  # missing corner
+                fsq = marchingsquares.Square.from_coords(
+                    (xs[ix], y1, z1[ix]), (xs[ix + 1], y1, z1[ix + 1]),
+                    (xs[ix + 1], y2, z2[ix + 1]), (xs[ix], y2, z2[ix]))
+                out += fsq.vectorize_isobands(wlevels)
+        del wx, wy, wz  # block released at the end of the task
     return out
 
 
+def create_pool(processes=None):
+    """Start a pool of worker.
+
+    :param processes: number of workers (number of CPU if None).
+    :return: multiprocessing.Pool object.
+    """
+    return multiprocessing.Pool(processes)
+
+
+def submit(executor, fn, args):
+    """Submit a task to a pool of worker or to an executor.
+
+    :param executor: multiprocessing.Pool or concurrent.futures.Executor.
+    :param fn: function.
+    :param args: arguments of the function.
+    :return: multiprocessing.pool.AsyncResult or concurrent.futures.Future.
+    """
+    if hasattr(executor, 'apply_async'):
+        return executor.apply_async(fn, args=args)
+    return executor.submit(fn, *args)
+
+
+def result(task):
+    """Wait for the result of a task (see ``submit``).
+
+    :param task: multiprocessing.pool.AsyncResult or
+                 concurrent.futures.Future.
+    :return: result of the task.
+    """
+    if hasattr(task, 'get'):
+        return task.get()
+    return task.result()
+
+
+def check_engine(engine, stitch):
+    """Check the options of the vectorization.
+
+    :param engine: 'square' or 'numpy'.
+    :param stitch: stitch the polygons of the squares.
+    """
+    if engine not in ('square', 'numpy'):
+        raise ValueError("unknown engine '{0}'".format(engine))
+    if stitch and engine != 'numpy':
+        raise ValueError("stitching needs the 'numpy' engine")
+
+
+def check_tilesize(tilesize, stitch):
+    """Check the size of the tiles of the vectorization.
+
+    :param tilesize: number of rows and columns of squares of the tiles (int
+                     or (rows, cols)), or None.
+    :param stitch: stitch the polygons of the squares.
+    :return: (rows, cols) or None.
+    """
+    if tilesize is None:
+        return None
+    if isinstance(tilesize, int):
+        tilesize = (tilesize, tilesize)
+    rows, cols = tilesize
+    if rows < 1 or cols < 1:
+        raise ValueError("size of tiles must be positive")
+    if stitch:
+        raise ValueError("stitching needs the whole grid, not tiles")
+    return rows, cols
+
+
+def check_dtype(dtype):
+    """Check the working type of floating point Z values.
+
+    :param dtype: numpy.float32, numpy.float64 (or their name or dtype), or
+                  None.
+    :return: numpy.dtype or None.
+    """
+    if dtype is None:
+        return None
+    try:
+        dtype = numpy.dtype(dtype)
+    except TypeError:
+        dtype = None
+    if dtype not in (numpy.float32, numpy.float64):
+        raise ValueError("working type must be float32 or float64")
+    return dtype
+
+
+def tiles(shape, tilesize):
+    """Tiles of squares of a grid.
+
+    Each square is in one tile. The tiles share their last row and column of
+    points with the next ones (one-cell overlap), so there is no gap between
+    their polygons.
+
+    :param shape: (ny, nx) number of points of the grid.
+    :param tilesize: (rows, cols) number of squares of the tiles.
+    :return: generator of (row0, row1, col0, col1) with the index of the
+             first and last points of the tiles, row by row.
+    """
+    ny, nx = shape
+    rows, cols = tilesize
+    for row0 in range(0, ny - 1, rows):
+        for col0 in range(0, nx - 1, cols):
+            yield (row0, min(row0 + rows, ny - 1), col0,
+                   min(col0 + cols, nx - 1))
+
+
+def cell_centers(origin, step, n):
+    """Coordinates of the centers of the cells of a regular axis.
+
+    Each coordinate is computed from its index, so there are always n
+    coordinates and no rounding error is accumulated along the axis.
+
+    :param origin: coordinate of the edge of the 1st cell.
+    :param step: size of the cells (negative for a decreasing axis).
+    :param n: number of cells.
+    :return: 1 axis array.
+    """
+    return origin + (numpy.arange(n) + 0.5) * step
+
+
 def precision_and_scale(x):
     """Get precision and scale of a number.
 
@@ -69,19 +212,113 @@ def limits(x, l):
 class Pygonize:
     """Pygonize : polygonize raster data into polygons vector."""
 
-    def __init__(self):
-        """Pygonize : polygonize raster data into polygons vector."""
+    def __init__(self, chunksize=None, processes=None, executor=None,
+                 tilesize=None, dtype=None):
+        """Pygonize : polygonize raster data into polygons vector.
+
+        The workers of the 'square' engine are started at each call, unless
+        the object is used as a context manager (the pool of worker is kept
+        until the end of the block) or an executor is given.
+
+        With ``tilesize``, the isobands are vectorized tile by tile: the
+        memory used depends on the size of the tiles, not on the size of the
+        data (see ``tiles``).
+
+        With ``dtype=numpy.float32``, floating point Z values are rounded to
+        float32 (relative error 2**-24), and so are the min/max pyramid, the
+        tiles and the levels compared to them; the levels are interpolated in
+        float32 while the X/Y coordinates stay float64. A point of a level on
+        an edge of length d between the values za and zb moves by at most
+        about d * 2**-22 * (1 + max(|za|, |zb|) / |zb - za|), i.e. a few
+        1e-7 of the grid spacing unless the edge is nearly flat compared to
+        its values. The grid and its intermediate arrays take half the
+        memory, so the tiles can be twice as large for the same memory. The
+        compact results are stored in float32 too (see ``collection``).
+
+        :param chunksize: number of rows of squares in each task of the
+                          'square' engine, or None to get about 4 tasks per
+                          worker.
+        :param processes: number of workers (number of CPU if None).
+        :param executor: external multiprocessing.Pool or
+                         concurrent.futures.Executor (of processes or
+                         threads) used for the tasks, or None.
+        :param tilesize: number of rows and columns of squares of the tiles
+                         (int or (rows, cols)), or None to vectorize the
+                         whole grid. It replaces ``chunksize``.
+        :param dtype: working type of floating point Z values
+                      (numpy.float32 or numpy.float64), or None to keep the
+                      type of the data. Integer data keeps its type.
+        """
+        self.chunksize = chunksize
+        self.tilesize = tilesize
+        self.dtype = check_dtype(dtype)
+        self.processes = processes
+        self.executor = executor
+        self._pool = None  # pool of worker kept by the context manager
         self.lx = None
         self.ly = None
         self.z = None
+        self.nodata = None  # value of the missing cells of integer z
+        self._auto_tilesize = None  # tiles of the data without ``tilesize``
+        self._pyramid = None  # (z, min/max pyramid of z)
+
+    def __enter__(self):
+        """Start a pool of worker kept until the end of the block."""
+        if self.executor is None and self._pool is None:
+            log.debug("create pool of worker")
+            self._pool = create_pool(self.processes)
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stop the pool of worker (an external executor is not stopped)."""
+        if self._pool is not None:
+            log.debug("stop pool of worker")
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def astype(self, z):
+        """Z values in the working type.
+
+        :param z: array of Z values.
+        :return: z itself, or a copy in ``dtype`` for floating point values of
+                 another type.
+        """
+        if self.dtype is None or z.dtype.kind != 'f' or z.dtype == self.dtype:
+            return z
+        return z.astype(self.dtype)
 
-    def read_array(self, x, y, z):
+    def read_array(self, x, y, z, nodata=None):
         """Read data from numpy arrays.
 
+        The arrays are kept without copy (unless Z values are converted to
+        ``dtype``, see ``astype``). A ``numpy.memmap`` of Z values
+        (e.g. from ``read_npy``) stays on disk: the isobands are then
+        vectorized by tiles of about 1M squares (unless ``tilesize`` is
+        given), so only the pages of a tile are read (and converted) at once,
+        but the stitching reads the whole grid.
+
+        The missing values are NaN: the squares with a missing corner have no
+        polygon. The masked values of a numpy.ma.MaskedArray, and the
+        floating point values equal to ``nodata``, are replaced by NaN (in a
+        floating point copy). Integer values keep their type, the cells equal
+        to ``nodata`` being missing.
+
         :param x: X coordinates as 1 axis array.
         :param y: Y coordinates as 1 axis array.
         :param z: Z coordinates with (y, x) shape.
+        :param nodata: value of the missing cells, or None.
         """
+        if nodata is not None and z.dtype.kind == 'f':
+            z = numpy.ma.masked_equal(z, nodata)
+        z = masked_to_nan(z)
+        mapped = isinstance(z, numpy.memmap)
+        if not mapped:
+            z = self.astype(z)
+
         # Check
         assert len(x.shape) == 1
         assert len(y.shape) == 1
@@ -91,116 +328,401 @@ class Pygonize:
         self.lx = x
         self.ly = y
         self.z = z
+        self.nodata = integer_nodata(z.dtype, nodata)
+        self._auto_tilesize = None
+        if mapped:
+            nx = max(len(x) - 1, 1)
+            self._auto_tilesize = (max(1, 2 ** 20 // nx), nx)
 
         # Log
         log.info("read array of {0} x {1}".format(len(x), len(y)))
-        log.debug("data value from {0:.2f} to {1:.2f}".format(z.min(), z.max()))
+        if not mapped:
+            self._log_values()
+
+    def read_npy(self, fn, x, y, mmap_mode='r', nodata=None):
+        """Read data from a .npy file, memory-mapped.
+
+        :param fn: path of the .npy file of Z values with (y, x) shape.
+        :param x: X coordinates as 1 axis array or path of a .npy file.
+        :param y: Y coordinates as 1 axis array or path of a .npy file.
+        :param mmap_mode: mode of ``numpy.load`` ('r', 'c', ...), or None to
+                          read the whole file into memory.
+        :param nodata: value of the missing cells, or None (see
+                       ``read_array``).
+        """
+        x, y = [numpy.load(a) if isinstance(a, str) else numpy.asarray(a)
+                for a in (x, y)]
+        self.read_array(x, y, numpy.load(fn, mmap_mode=mmap_mode), nodata)
 
-    def read_raster(self, fn, band=1):
+    def read_raster(self, fn, band=1, stream=False):
         """Read raster data.
 
+        Only the selected band is read. With ``stream``, the values are not
+        read at once: the Z values are a ``raster.RasterBand`` read window by
+        window when the tiles are vectorized, the file being kept open for all
+        the tiles. The tiles are aligned on the internal blocks of the file
+        unless ``tilesize`` is given, each window overlapping the next blocks
+        by one row and one column (see ``RasterBand.tilesize``). The
+        stitching reads the whole band.
+
+        The coordinates of the points are the centers of the cells, computed
+        from the origin and the step of the raster. The nodata cells are NaN
+        for floating point data; integer data keeps its type, with the nodata
+        value in ``nodata`` (see ``raster.integer_nodata``).
+
         :param fn: path of raster.
         :param band: band number (from 1 to ...).
+        :param stream: read the band window by window.
         """
         with rasterio.open(fn) as rst:
-            self.z = rst.read()[band - 1, :, :]
+            if not stream:
+                if not 1 <= band <= rst.count:
+                    raise ValueError("raster has no band {0}".format(band))
+                nodata = integer_nodata(rst.dtypes[band - 1], rst.nodata)
+                self.z = self.astype(masked_to_nan(rst.read(
+                    band, masked=rst.nodata is not None and nodata is None)))
             xmin, dx, _, ymin, _, dy = rst.get_transform()  # geographic info
+        self._auto_tilesize = None
+        if stream:
+            self.z = RasterBand(fn, band)
+            nodata = self.z.nodata
+            self._auto_tilesize = self.z.tilesize()
+        self.nodata = nodata
 
         ny, nx = self.z.shape
-        self.lx = numpy.arange(xmin + dx / 2, xmin + nx * dx, dx)
-        self.ly = numpy.arange(ymin + dy / 2, ymin + ny * dy, dy)
+        self.lx = cell_centers(xmin, dx, nx)
+        self.ly = cell_centers(ymin, dy, ny)
 
         # Log
         log.info("read raster of {0} x {1}".format(nx, ny))
-        log.debug("data value from {0:.2f} to {1:.2f}".format(
-            self.z.min(), self.z.max()))
+        if not stream:
+            self._log_values()
+
+    def _log_values(self):
+        """Log the range of the data values and the number of missing ones."""
+        if not log.isEnabledFor(logging.DEBUG):
+            return
+        missing = self._missing(self.z)
+        nmissing = int(numpy.count_nonzero(missing))
+        if nmissing < self.z.size:
+            if self.nodata is None:
+                zmin, zmax = numpy.nanmin(self.z), numpy.nanmax(self.z)
+            else:
+                values = numpy.ma.masked_array(self.z, missing)
+                zmin, zmax = values.min(), values.max()
+            log.debug("data value from {0:.2f} to {1:.2f}".format(zmin,
+                                                                    zmax))
+        if nmissing:
+            log.debug("{0} missing values".format(nmissing))
+
+    def _missing(self, z):
+        """Missing cells of Z values.
+
+        :param z: array of Z values (e.g. of a tile).
+        :return: boolean array, True for NaN or ``nodata``.
+        """
+        if self.nodata is None:
+            return numpy.isnan(z)
+        return z == self.nodata
 
-    def vectorize_isobands(self, levels):
+    def _tilesize(self, stitch):
+        """Size of the tiles of the vectorization.
+
+        :param stitch: stitch the polygons of the squares.
+        :return: (rows, cols) of ``tilesize``, or else of the data (see
+                 ``read_array``) unless stitching, or None.
+        """
+        if self.tilesize is not None or stitch:
+            return check_tilesize(self.tilesize, stitch)
+        if self._auto_tilesize is not None:
+            log.debug("tiles of {0} x {1}".format(*self._auto_tilesize))
+        return self._auto_tilesize
+
+    def pyramid(self, z=None):
+        """Min/max pyramid of the data.
+
+        It is built at the 1st call and kept for the next calls, until the
+        data change.
+
+        :param z: Z values already read from the data (e.g. a whole streamed
+                  band), or None.
+        :return: ``pyramid.Pyramid`` object.
+        """
+        if self._pyramid is None or self._pyramid[0] is not self.z:
+            log.debug("build min/max pyramid")
+            self._pyramid = (self.z, Pyramid(self.z if z is None else z,
+                                             self.nodata))
+        return self._pyramid[1]
+
+    def tile(self, row0, row1, col0, col1):
+        """Data of a tile.
+
+        :param row0: index of the first row of points.
+        :param row1: index of the last row of points.
+        :param col0: index of the first column of points.
+        :param col1: index of the last column of points.
+        :return: (x, y, z) arrays (views of the data, or z in the working
+                 type, see ``astype``).
+        """
+        return (self.lx[col0:col1 + 1], self.ly[row0:row1 + 1],
+                self.astype(self.z[row0:row1 + 1, col0:col1 + 1]))
+
+    def vectorize_isobands(self, levels, engine='square', stitch=False,
+                           compact=False):
         """Vectorization of isobands.
 
+        Two engines are available:
+
+         * 'square': reference engine, each square is vectorized with
+           ``marchingsquares.Square`` by a pool of worker, with one task per
+           strip of rows (see ``chunksize``).
+         * 'numpy': all the squares are classified at once with numpy arrays
+           (see ``vectorized`` module). The blocks of squares outside an
+           isoband are skipped and the blocks inside an isoband give one
+           rectangle, with the min/max pyramid of the data (see ``pyramid``).
+
+        With ``stitch``, the polygons of the squares are assembled into one
+        polygon (with holes) per connected region of each isoband. It needs
+        the 'numpy' engine.
+
+        With ``compact``, the polygons are stored as they are generated into
+        a ``collection.IsobandCollection`` (flat arrays of coordinates, with
+        the isoband of each polygon) instead of a list of shapely objects.
+
         :param levels: list of levels.
-        :return: list of shapely.geometry.Polygon.
+        :param engine: 'square' or 'numpy'.
+        :param stitch: stitch the polygons of the squares.
+        :param compact: return an IsobandCollection.
+        :return: list of shapely.geometry.Polygon or IsobandCollection.
         """
         levels = sorted(levels)
-        log.debug("create pool of worker to vectorize data")
-        pool = multiprocessing.Pool()  # start a pool of worker
-        outs = list()  # list of multiprocessing.pool.AsyncResult
+        check_engine(engine, stitch)
+        tilesize = self._tilesize(stitch)
+        if compact:
+            polys = IsobandCollection.from_polygons(
+                self.iter_isobands(levels, engine=engine, stitch=stitch),
+                levels, dtype=self.dtype or float)
+        elif engine == 'numpy' and tilesize is None:
+            log.info("starting isoband vectorization with levels {0} "
+                     "(numpy engine)...".format(levels))
+            z = numpy.asarray(self.z)
+            polys = vectorized.vectorize_isobands(self.lx, self.ly, z,
+                                                  levels, stitch=stitch,
+                                                  pyramid=self.pyramid(z),
+                                                  nodata=self.nodata)
+        else:
+            polys = list(self.iter_isobands(levels, engine=engine))
+        log.info("isoband vectorization done.")
+        log.debug(" -> {n} polygons".format(n=len(polys)))
+        return polys
 
-        ny, nx = self.z.shape
+    def vectorize_isolines(self, levels):
+        """Vectorization of isolines.
 
-        # Grid of X and Y
-        x, y = numpy.meshgrid(self.lx, self.ly)
+        The squares are classified at once with numpy arrays (see
+        ``vectorized.vectorize_isolines``) and their segments are joined into
+        lines, level by level.
 
-        # Split dataset into squares and vectorize
-        log.info("starting isoband vectorization with levels {0}...".format(
+        :param levels: list of levels.
+        :return: list of marchingsquares.Isoline (shapely LineString with the
+                 level as Z value), sorted by level.
+        """
+        levels = sorted(levels)
+        log.info("starting isoline vectorization with levels {0}...".format(
             levels))
-        for iy in range(ny - 1):
-            for ix in range(nx - 1):
-                part_z = self.z[iy:iy+2, ix:ix+2]
-                part_x = x[iy:iy+2, ix:ix+2]
-                part_y = y[iy:iy+2, ix:ix+2]
-
-                p1 = Point(part_x[0, 0], part_y[0, 0], part_z[0, 0])
-                p2 = Point(part_x[0, 1], part_y[0, 1], part_z[0, 1])
-                p3 = Point(part_x[1, 1], part_y[1, 1], part_z[1, 1])
-                p4 = Point(part_x[1, 0], part_y[1, 0], part_z[1, 0])
-
-                # Create task
-                w = pool.apply_async(vectorize_isoband_worker,
-                                     args=(p1, p2, p3, p4, levels))
-                outs.append(w)
-
-        # Wait for all process to be terminated
-        log.debug("create {n} tasks".format(n=len(outs)))
-        pool.close()
-        pool.join()
-
-        # Join all resulting polygons
-        polys = list()
-        for w in outs:
-            polys += w.get()
+        lines = vectorized.vectorize_isolines(self.lx, self.ly,
+                                              numpy.asarray(self.z), levels,
+                                              nodata=self.nodata)
+        log.info("isoline vectorization done.")
+        log.debug(" -> {n} lines".format(n=len(lines)))
+        return lines
+
+    def iter_isobands(self, levels, engine='square', stitch=False):
+        """Vectorization of isobands, as a generator.
+
+        The polygons are the ones of ``vectorize_isobands``, in the same
+        order, but they are yielded as soon as a part of the grid is done:
+
+         * 'square' engine: strip by strip (see ``chunksize``), with a few
+           tasks submitted in advance.
+         * 'numpy' engine: strip by strip (``chunksize`` rows of squares, or
+           about 1M squares), or isoband by isoband with ``stitch``. The
+           rectangles of the blocks inside an isoband are split between the
+           strips.
+
+        With ``tilesize``, both engines yield the polygons tile by tile (one
+        task per tile for the 'square' engine, with a min/max pyramid of the
+        tile for the 'numpy' engine).
 
-        log.info("isoband vectorization done.")
-        log.debug(" -> {n} polygons".format(n=len(polys)))
-        return polys
+        :param levels: list of levels.
+        :param engine: 'square' or 'numpy'.
+        :param stitch: stitch the polygons of the squares.
+        :return: generator of shapely.geometry.Polygon.
+        """
+        levels = sorted(levels)
+        check_engine(engine, stitch)
+        tilesize = self._tilesize(stitch)
+        if engine == 'numpy':
+            if tilesize is not None:
+                return self._iter_isobands_tiles(levels, tilesize)
+            return self._iter_isobands_numpy(levels, stitch)
+        return self._iter_isobands_square(levels, tilesize)
+
+    def _iter_isobands_tiles(self, levels, tilesize):
+        """Generator of isobands of the 'numpy' engine, tile by tile."""
+        log.info("starting isoband vectorization with levels {0} "
+                 "(numpy engine, tiles of {1} x {2})...".format(
+                     levels, *tilesize))
+        for window, (x, y, z) in self._data_tiles(tilesize):
+            yield from vectorized.vectorize_isobands(
+                x, y, z, levels, pyramid=Pyramid(z, self.nodata),
+                nodata=self.nodata)
+
+    def _iter_isobands_numpy(self, levels, stitch):
+        """Generator of isobands of the 'numpy' engine."""
+        log.info("starting isoband vectorization with levels {0} "
+                 "(numpy engine)...".format(levels))
+        # Isoband by isoband, the stitching needs the whole grid
+        if stitch:
+            z = numpy.asarray(self.z)
+            yield from vectorized.iter_isobands(self.lx, self.ly, z, levels,
+                                                stitch=True,
+                                                pyramid=self.pyramid(z),
+                                                nodata=self.nodata)
+            return
+
+        # Strip by strip
+        pyramid = self.pyramid()
+        ny, nx = self.z.shape
+        chunksize = self.chunksize or max(1, 2 ** 20 // nx)
+        for iy in range(0, ny - 1, chunksize):
+            end = min(iy + chunksize, ny - 1)
+            yield from vectorized.vectorize_isobands(
+                self.lx, self.ly[iy:end + 1], self.z[iy:end + 1], levels,
+                pyramid=pyramid.window(iy, end, 0, nx - 1),
+                nodata=self.nodata)
+
+    def _iter_isobands_square(self, levels, tilesize=None):
+        """Generator of isobands of the 'square' engine."""
+        ny, nx = self.z.shape
+        nproc = self.processes or multiprocessing.cpu_count()
+        chunksize = self.chunksize
+        if not chunksize:
+            chunksize = max(1, math.ceil((ny - 1) / (4 * nproc)))
+
+        # Pool of worker of the call, if none is kept
+        executor = self.executor or self._pool
+        if executor is None:
+            log.debug("create pool of worker to vectorize data")
+            pool = executor = create_pool(self.processes)
+        else:
+            pool = None
+
+        # Data shared with the workers, without copy: the whole grid, or
+        # each tile as long as its task is running
+        log.debug("share data with the workers")
+        outs = collections.deque()  # tasks and their tile
+        try:
+            with contextlib.ExitStack() as stack:
+                if tilesize is None:
+                    grid = stack.enter_context(
+                        sharedgrid.SharedGrid(self.lx, self.ly, self.z))
+                    blocks = ((grid, iy, min(iy + chunksize, ny - 1), None)
+                              for iy in range(0, ny - 1, chunksize))
+                else:
+                    blocks = self._shared_tiles(tilesize)
+
+                # Split dataset into strips of rows (or tiles) and vectorize,
+                # with a limited number of tasks waiting for their results
+                log.info("starting isoband vectorization with levels {0}..."
+                         "".format(levels))
+                for grid, start, end, tile in blocks:
+                    outs.append((submit(executor,
+                                        vectorize_isoband_strip_worker,
+                                        (grid.spec, start, end, levels,
+                                         self.nodata)),
+                                 tile))
+                    if len(outs) > 2 * nproc:
+                        yield from self._result(*outs.popleft())
+                while outs:
+                    yield from self._result(*outs.popleft())
+        finally:
+            for _, tile in outs:  # tiles of the tasks not done
+                if tile is not None:
+                    tile.close()
+
+            # Wait for all process of the call to be terminated
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def _shared_tiles(self, tilesize):
+        """Tiles of the data shared with the workers, one by one.
+
+        :param tilesize: (rows, cols) number of squares of the tiles.
+        :return: generator of (grid, start, end, tile) with the shared tile
+                 and the rows of squares of its task (see
+                 ``vectorize_isoband_strip_worker``), the tile being
+                 released by ``_result``.
+        """
+        for (row0, row1, _, _), data in self._data_tiles(tilesize):
+            tile = sharedgrid.SharedGrid(*data)
+            yield tile, 0, row1 - row0, tile
 
-    def write_shapefile(self, levels, fn):
+    def _data_tiles(self, tilesize):
+        """Tiles with data, the tiles without data being skipped.
+
+        :param tilesize: (rows, cols) number of squares of the tiles.
+        :return: generator of ((row0, row1, col0, col1), (x, y, z)) (see
+                 ``tiles`` and ``tile``).
+        """
+        # A streamed band is kept open for all the tiles (see ``RasterBand``)
+        with self.z if isinstance(self.z, RasterBand) else \
+                contextlib.nullcontext():
+            for window in tiles(self.z.shape, tilesize):
+                data = self.tile(*window)
+                if self._missing(data[2]).all():
+                    log.debug("skip tile {0} without data".format(window))
+                    continue
+                yield window, data
+
+    @staticmethod
+    def _result(task, tile):
+        """Result of a task of the 'square' engine, the tile being released.
+
+        :param task: task (see ``submit``).
+        :param tile: sharedgrid.SharedGrid of the tile of the task or None.
+        :return: list of polygons.
+        """
+        try:
+            return result(task)
+        finally:
+            if tile is not None:
+                tile.close()
+
+    def write_shapefile(self, levels, fn, engine='square', stitch=False):
         """Vectorization of isobands and save result into shapefile.
 
         :param levels: list of levels.
         :param fn: path of shapefile.
+        :param engine: 'square' or 'numpy' (see ``vectorize_isobands``).
+        :param stitch: stitch the polygons of the squares.
         """
         log.info("writing isobands into shapefile...")
         levels = sorted(levels)
-        polys = self.vectorize_isobands(levels)
+        polys = self.iter_isobands(levels, engine=engine, stitch=stitch)
         inf = map(precision_and_scale, levels)  # precision and scale of levels
         precision, scale = max(inf)
 
-        # Writing shapefile
-        w = shapefile.Writer(shapeType=shapefile.POLYGON)
-        w.field('id', 'N')
-        w.field('lvlmn', 'N', size=precision, decimal=scale)
-        w.field('lvlmx', 'N', size=precision, decimal=scale)
-
-        for ipoly, poly in enumerate(polys, start=1):
-
-            # Find lvl min and max
-            zs = numpy.array([z for (x, y, z) in poly.exterior.coords[:]])
-            zmin, zmax = zs.min(), zs.max()
-
-            # Limits from levels
-            zmn1, zmn2 = limits(zmin, levels)
-            zmx1, zmx2 = limits(zmax, levels)
-            zmin = min(zmn1, zmn2)
-            zmax = max(zmx1, zmx2)
-
-            # convert with specific scale
-            zmin = format(zmin, '.{scale}f'.format(scale=scale))
-            zmax = format(zmax, '.{scale}f'.format(scale=scale))
-            del zs
-
-            w.poly(parts=poly.__geo_interface__['coordinates'])
-            w.record(ipoly, zmin, zmax)
+        # Writing shapefile, polygon by polygon
+        fields = [('id', 'N', 50, 0),
+                  ('lvlmn', 'N', precision, scale),
+                  ('lvlmx', 'N', precision, scale)]
+        fmt = {lvl: format(lvl, '.{scale}f'.format(scale=scale))
+               for lvl in levels}  # levels with specific scale
+        with ShapefileWriter(fn, fields) as w:
+            for ipoly, poly in enumerate(polys, start=1):
+                w.poly(poly.__geo_interface__['coordinates'],
+                       ipoly, fmt[poly.lvlmn], fmt[poly.lvlmx])
 
-        w.save(fn)
         log.info("writing isobands into shapefile done.")
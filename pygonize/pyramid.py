@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Min/max pyramid of the squares of a grid."""
+
+
+import numpy
+from .vectorized import expand, isoband_ranges, level_array, square_limits
+
+
+def reduce_blocks(zmin, zmax):
+    """Minimum and maximum of the blocks of 2 x 2 cells.
+
+    The last row and column are repeated if the shape is odd, which does not
+    change the limits of the blocks. The missing cells (NaN) are ignored by
+    the minimum but not by the maximum: a block with data has a minimum, and
+    a block with missing cells is never inside an isoband. The missing
+    integer cells have empty limits (see ``vectorized.square_limits``),
+    ignored by the minimum and the maximum: their blocks are flagged by
+    ``reduce_missing``.
+
+    :param zmin: array of the minimum values of the cells.
+    :param zmax: array of the maximum values of the cells.
+    :return: (zmin, zmax) arrays with half the shape (rounded up).
+    """
+    pad = [(0, n % 2) for n in zmin.shape]
+    zmin, zmax = numpy.pad(zmin, pad, 'edge'), numpy.pad(zmax, pad, 'edge')
+    ny, nx = zmin.shape
+    return (numpy.fmin.reduce(zmin.reshape(ny // 2, 2, nx // 2, 2),
+                              axis=(1, 3)),
+            zmax.reshape(ny // 2, 2, nx // 2, 2).max(axis=(1, 3)))
+
+
+def reduce_missing(missing):
+    """Blocks of 2 x 2 cells with a missing cell.
+
+    :param missing: boolean array of the cells with a missing value.
+    :return: boolean array with half the shape (rounded up).
+    """
+    missing = numpy.pad(missing, [(0, n % 2) for n in missing.shape], 'edge')
+    ny, nx = missing.shape
+    return missing.reshape(ny // 2, 2, nx // 2, 2).any(axis=(1, 3))
+
+
+class Pyramid:
+    """Min/max pyramid (quadtree) of the squares of a grid.
+
+    The 1st level is the minimum and the maximum of the corners of each
+    square, each following level groups 2 x 2 blocks of the previous one,
+    until the whole grid is one block. It does not depend on the levels of
+    the isobands and can be used for any list of levels.
+
+    The squares with a missing corner (NaN, or ``nodata`` for integer data)
+    have empty limits, so they are never crossed by an isoband, and the
+    blocks without data are skipped (see ``reduce_blocks``).
+    """
+
+    def __init__(self, z, nodata=None):
+        """Min/max pyramid of the squares of a grid.
+
+        :param z: Z values with (y, x) shape.
+        :param nodata: value of the missing cells of integer data, or None.
+        """
+        self.z = z
+        zmin, zmax = square_limits(z, nodata)
+        self.shape = zmin.shape  # number of squares
+        self.zmin, self.zmax = [zmin], [zmax]
+        missing = None  # squares with a missing integer corner
+        if nodata is not None:
+            missing = zmin > zmax
+        self.missing = [missing]
+        while zmin.size and max(zmin.shape) > 1:
+            zmin, zmax = reduce_blocks(zmin, zmax)
+            self.zmin.append(zmin)
+            self.zmax.append(zmax)
+            if missing is not None:
+                missing = reduce_missing(missing)
+            self.missing.append(missing)
+
+    def isobands(self, levels, window=None):
+        """Blocks and squares crossed by isobands.
+
+        The pyramid is visited from the top: blocks outside an isoband are
+        skipped, blocks fully inside an isoband are kept as rectangles, the
+        other blocks are split into their 4 children down to the squares.
+
+        :param levels: sorted list of levels.
+        :param window: (row0, row1, col0, col1) with the index of the first
+                       and after the last rows and columns of squares to
+                       visit, or None for the whole grid. The results are
+                       relative to the window.
+        :return: (rectangles, squares, bands). rectangles is a tuple of arrays
+                 (row0, row1, col0, col1, band) with the index of the first
+                 and last points of the blocks inside the isoband band.
+                 squares and bands are the flat index of the other squares
+                 and of the isobands crossing them, sorted by square then by
+                 isoband (see ``vectorized.isoband_fragments``).
+        """
+        levels = level_array(levels, self.zmin[0].dtype)
+        wy0, wy1, wx0, wx1 = window or (0, self.shape[0], 0, self.shape[1])
+        rectangles = [list() for i in range(5)]
+        iy = ix = numpy.zeros(1 if self.zmin[0].size else 0, dtype=int)
+        for k in range(len(self.zmin) - 1, -1, -1):
+            # Blocks in the window
+            size = 2 ** k
+            valid = ((iy * size < wy1) & (iy * size + size > wy0) &
+                     (ix * size < wx1) & (ix * size + size > wx0) &
+                     (iy < self.zmin[k].shape[0]) &
+                     (ix < self.zmin[k].shape[1]))
+            iy, ix = iy[valid], ix[valid]
+
+            zmin, zmax = self.zmin[k][iy, ix], self.zmax[k][iy, ix]
+            first, count = isoband_ranges(zmin, zmax, levels)
+            if k == 0:
+                owner, bands = expand(first, count)
+                squares = (iy[owner] - wy0) * (wx1 - wx0) + ix[owner] - wx0
+                order = numpy.lexsort((bands, squares))
+                break
+
+            # Blocks inside an isoband
+            inside = count == 1
+            band = first[inside]
+            inside[inside] = ((zmin[inside] > levels[band]) &
+                              (zmax[inside] < levels[band + 1]))
+            if self.missing[k] is not None:
+                inside &= ~self.missing[k][iy, ix]
+            by, bx = iy[inside] * size, ix[inside] * size
+            for r, v in zip(rectangles,
+                            (numpy.maximum(by, wy0) - wy0,
+                             numpy.minimum(by + size, wy1) - wy0,
+                             numpy.maximum(bx, wx0) - wx0,
+                             numpy.minimum(bx + size, wx1) - wx0,
+                             first[inside])):
+                r.append(v)
+
+            # Children of the blocks crossed by an isoband
+            keep = (count > 0) & ~inside
+            iy = (iy[keep, None] * 2 + [0, 0, 1, 1]).ravel()
+            ix = (ix[keep, None] * 2 + [0, 1, 0, 1]).ravel()
+
+        rectangles = tuple(numpy.concatenate(r) if r else
+                           numpy.zeros(0, dtype=int) for r in rectangles)
+        return rectangles, squares[order], bands[order]
+
+    def window(self, row0, row1, col0, col1):
+        """Part of the pyramid for a window of squares.
+
+        :param row0: index of the first row of squares.
+        :param row1: index of the row after the last row of squares.
+        :param col0: index of the first column of squares.
+        :param col1: index of the column after the last column of squares.
+        :return: ``PyramidWindow`` object.
+        """
+        return PyramidWindow(self, (row0, row1, col0, col1))
+
+
+class PyramidWindow:
+    """Part of a min/max pyramid for a window of squares.
+
+    It is used as a pyramid of the sub-grid of the window (see
+    ``Pyramid.window``).
+    """
+
+    def __init__(self, pyramid, window):
+        """Part of a min/max pyramid for a window of squares.
+
+        :param pyramid: ``Pyramid`` object.
+        :param window: (row0, row1, col0, col1) of the window of squares.
+        """
+        self.pyramid = pyramid
+        self.window = window
+
+    def isobands(self, levels):
+        """Blocks and squares of the window crossed by isobands.
+
+        :param levels: sorted list of levels.
+        :return: see ``Pyramid.isobands``.
+        """
+        return self.pyramid.isobands(levels, self.window)
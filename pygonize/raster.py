@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Band of a raster file read window by window."""
+
+
+import math
+import numpy
+import rasterio
+from rasterio.windows import Window
+
+
+def masked_to_nan(z):
+    """Replace the masked values of an array by NaN.
+
+    :param z: array or numpy.ma.MaskedArray.
+    :return: the array itself if nothing is masked, or a floating point copy
+             (at least float32) with NaN at the masked values.
+    """
+    mask = numpy.ma.getmask(z)
+    if mask is numpy.ma.nomask or not mask.any():
+        return numpy.ma.getdata(z)
+    dtype = numpy.promote_types(z.dtype, numpy.float32)
+    return numpy.ma.filled(z.astype(dtype), numpy.nan)
+
+
+def integer_nodata(dtype, nodata):
+    """Nodata value kept in integer data.
+
+    The integer data with a nodata value keeps its type (instead of a
+    floating point copy with NaN), the nodata cells being excluded by their
+    value.
+
+    :param dtype: type of the data.
+    :param nodata: nodata value of the raster, or None.
+    :return: nodata as an integer for integer data, or None for floating
+             point data (the nodata cells are NaN) or if no value of the type
+             is nodata.
+    """
+    dtype = numpy.dtype(dtype)
+    if nodata is None or dtype.kind not in 'iu' or not math.isfinite(nodata):
+        return None
+    info = numpy.iinfo(dtype)
+    if nodata != round(nodata) or not info.min <= nodata <= info.max:
+        return None
+    return int(nodata)
+
+
+def axis_index(key, n):
+    """Index of an axis from an integer or a slice.
+
+    :param key: integer or slice.
+    :param n: length of the axis.
+    :return: (index, squeeze) with the list of index and True for an integer.
+    """
+    if isinstance(key, slice):
+        return list(range(*key.indices(n))), False
+    key = int(key)
+    if key < 0:
+        key += n
+    if not 0 <= key < n:
+        raise IndexError("index out of range")
+    return [key], True
+
+
+class RasterBand:
+    """Band of a raster file, read window by window.
+
+    It can replace the array of Z values of a grid: the values are only read
+    when a part of the band is indexed, with the window of rows and columns
+    of the index (e.g. ``band[10:20, 5:9]``). With a nodata value, floating
+    point values are NaN at the nodata cells and integer values keep their
+    type, with the nodata value in ``nodata`` (see ``integer_nodata``).
+
+    Used as a context manager, the file is kept open until the end of the
+    block: the windows are read from the same dataset, so the internal
+    blocks of the file shared by several windows are decoded once (they stay
+    in the block cache of GDAL). Otherwise the file is opened for each
+    window.
+    """
+
+    def __init__(self, fn, band=1):
+        """Band of a raster file.
+
+        :param fn: path of raster.
+        :param band: band number (from 1 to ...).
+        """
+        self.fn = fn
+        self.band = band
+        with rasterio.open(fn) as rst:
+            if not 1 <= band <= rst.count:
+                raise ValueError("raster has no band {0}".format(band))
+            self.shape = (rst.height, rst.width)
+            self.dtype = numpy.dtype(rst.dtypes[band - 1])
+            self.nodata = integer_nodata(self.dtype, rst.nodata)
+            # floating point data read with NaN at the nodata cells
+            self._masked = rst.nodata is not None and self.nodata is None
+            self.block_shape = tuple(rst.block_shapes[band - 1])
+        self.ndim = 2
+        self._dataset = None  # dataset kept open by the context manager
+        self._depth = 0  # number of nested blocks of the context manager
+
+    def __enter__(self):
+        """Keep the file open until the end of the block."""
+        if self._dataset is None:
+            self._dataset = rasterio.open(self.fn)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *args):
+        self._depth -= 1
+        if not self._depth:
+            self._dataset.close()
+            self._dataset = None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        """Values of a window of the band.
+
+        :param key: index of the rows, or of the rows and the columns
+                    (integers or slices).
+        :return: array.
+        """
+        if not isinstance(key, tuple):
+            key = (key, )
+        if len(key) == 1:
+            key += (slice(None), )
+        (rows, sqr), (cols, sqc) = [axis_index(k, n)
+                                    for k, n in zip(key, self.shape)]
+        if not rows or not cols:
+            out = numpy.empty((len(rows), len(cols)), self.dtype)
+        else:
+            r0, c0 = min(rows), min(cols)
+            with self:
+                out = self._dataset.read(self.band, window=Window(
+                    c0, r0, max(cols) + 1 - c0, max(rows) + 1 - r0),
+                    masked=self._masked)
+            out = masked_to_nan(out).astype(self.dtype, copy=False)
+            if rows != list(range(r0, r0 + len(rows))) or \
+                    cols != list(range(c0, c0 + len(cols))):  # steps
+                out = out[numpy.ix_([r - r0 for r in rows],
+                                    [c - c0 for c in cols])]
+        if sqc:
+            out = out[:, 0]
+        if sqr:
+            out = out[0]
+        return out
+
+    def __array__(self, dtype=None):
+        out = self[:, :]
+        return out if dtype is None else out.astype(dtype)
+
+    def tilesize(self, minimum=256):
+        """Size of tiles aligned on the internal blocks of the file.
+
+        The window of a tile has one more row and column of points than its
+        squares, shared with the next tiles: it overlaps the next blocks of
+        the file, which are only decoded once if the file is kept open (see
+        ``RasterBand``).
+
+        :param minimum: minimum number of rows and columns of the tiles
+                        (unless the band is smaller).
+        :return: (rows, cols) multiple of the shape of the blocks.
+        """
+        return tuple(min(-(-minimum // b) * b, max(n - 1, 1))
+                     for b, n in zip(self.block_shape, self.shape))
+
+    def read(self):
+        """Read the whole band.
+
+        :return: array with (y, x) shape.
+        """
+        return self[:, :]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Grid shared with the workers through shared memory."""
+
+
+import contextlib
+from multiprocessing import resource_tracker, shared_memory
+import threading
+import weakref
+import numpy
+
+
+_lock = threading.Lock()  # for the tasks run by threads
+_created = dict()  # arrays of the grids created by the process, by name
+_attached = dict()  # [block, arrays, tasks] attached by the process, by name
+_released = list()  # (block, weak references to its arrays) to close
+
+
+def views(buf, layout):
+    """Arrays of a buffer.
+
+    :param buf: buffer of a shared memory block.
+    :param layout: list of (dtype, shape, offset) of the arrays.
+    :return: list of arrays (without copy).
+    """
+    return [numpy.ndarray(shape, dtype, buffer=buf, offset=offset)
+            for dtype, shape, offset in layout]
+
+
+def open_block(name):
+    """Attach an existing block of shared memory, without tracking it.
+
+    The block belongs to the process which created it: a worker with its own
+    resource tracker (e.g. started before the one of the main process) must
+    not register the block, or its tracker would warn about a leak and unlink
+    the block when the worker stops.
+
+    :param name: name of the block.
+    :return: multiprocessing.shared_memory.SharedMemory object.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13, called with ``_lock``
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedGrid:
+    """X, Y and Z arrays of a grid in a block of shared memory.
+
+    The block is created and filled once by the main process. The workers
+    only receive its description (see ``spec``) and read the arrays in place
+    with ``attach`` (the tasks run by threads of the main process read the
+    arrays of the grid itself).
+    """
+
+    def __init__(self, x, y, z):
+        """Copy the arrays of a grid into a new block of shared memory.
+
+        :param x: X coordinates as 1 axis array.
+        :param y: Y coordinates as 1 axis array.
+        :param z: Z values with (y, x) shape.
+        """
+        arrays = [numpy.asarray(a) for a in (x, y, z)]
+        layout, size = list(), 0
+        for a in arrays:
+            layout.append((a.dtype.str, a.shape, size))
+            size += -(-a.nbytes // 8) * 8  # aligned on 8 bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.spec = (self.shm.name, tuple(layout))
+        self.arrays = views(self.shm.buf, layout)
+        for a, view in zip(arrays, self.arrays):
+            view[...] = a
+        with _lock:
+            _created[self.shm.name] = self.arrays
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Release the block of shared memory."""
+        with _lock:
+            _created.pop(self.shm.name, None)
+        self.arrays = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def release(name):
+    """Release a block attached by the process (called with ``_lock``).
+
+    The block is only closed once its arrays (and their views, which keep
+    them alive) are deleted, since numpy does not prevent the closing of a
+    buffer it uses: a block whose arrays are still referenced (e.g. by a
+    traceback) is closed by a next release.
+
+    :param name: name of the block.
+    """
+    entry = _attached.pop(name)
+    _released.append((entry[0], [weakref.ref(a) for a in entry[1]]))
+    entry[1] = None
+    for item in list(_released):
+        shm, refs = item
+        if all(ref() is None for ref in refs):
+            shm.close()
+            _released.remove(item)
+
+
+@contextlib.contextmanager
+def attach(spec):
+    """Arrays of a shared grid, from a worker, for the time of a task.
+
+    The block is attached by the 1st task of the worker using it and
+    released at the end of the last one, so an idle worker keeps no block:
+    the task must delete its references to the arrays before the end of the
+    context. In the process which created the grid (tasks run by threads),
+    the arrays of the grid are used.
+
+    :param spec: description of the block (see ``SharedGrid.spec``).
+    :return: context manager of the (x, y, z) arrays.
+    """
+    name, layout = spec
+    with _lock:
+        if name in _created:
+            entry = [None, _created[name], 1]
+        else:
+            if name not in _attached:
+                shm = open_block(name)
+                _attached[name] = [shm, views(shm.buf, layout), 0]
+            entry = _attached[name]
+            entry[2] += 1
+    try:
+        yield entry[1]
+    finally:
+        with _lock:
+            entry[2] -= 1
+            if entry[0] is not None and not entry[2]:
+                release(name)
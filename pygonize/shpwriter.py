@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Shapefile writer of polygons, record by record.
+
+The polygons are written into the .shp, .shx and .dbf files as soon as they
+are given, so the memory does not depend on the number of polygons. The
+files are the same than the ones of ``shapefile.Writer`` (pyshp).
+"""
+
+
+import os
+from struct import pack
+import time
+
+
+POLYGON = 5  # shape type
+
+
+class ShapefileWriter:
+    """Shapefile writer of polygons, record by record."""
+
+    def __init__(self, fn, fields):
+        """Create the .shp, .shx and .dbf files.
+
+        :param fn: path of the shapefile (with or without extension).
+        :param fields: list of (name, type, size, decimal) of the fields of
+                       the records, with 'N', 'F' or 'C' type.
+        """
+        self.fields = [(name, ftype.upper(), int(size), decimal)
+                       for name, ftype, size, decimal in fields]
+        base = os.path.splitext(fn)[0]
+        self.shp = open(base + '.shp', 'wb')
+        self.shx = open(base + '.shx', 'wb')
+        self.dbf = open(base + '.dbf', 'wb')
+        self.count = 0  # number of records
+        self.extent = None  # [xmin, ymin, xmax, ymax, zmin, zmax]
+
+        # Headers, written again with the totals by ``close``
+        self.shp.write(self.header(0))
+        self.shx.write(self.header(0))
+        self.dbf_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def header(self, length):
+        """Header of the .shp and .shx files.
+
+        :param length: length of the file in bytes.
+        :return: bytes.
+        """
+        extent = self.extent or [0] * 6
+        return (pack('>6i', 9994, 0, 0, 0, 0, 0) + pack('>i', length // 2) +
+                pack('<2i', 1000, POLYGON) + pack('<6d', *extent) +
+                pack('<2d', 0, 0))
+
+    def dbf_header(self):
+        """Write the header and the field descriptors of the .dbf file."""
+        year, month, day = time.localtime()[:3]
+        self.dbf.seek(0)
+        self.dbf.write(pack('<BBBBLHH20x', 3, year - 1900, month, day,
+                            self.count, len(self.fields) * 32 + 33,
+                            sum(f[2] for f in self.fields) + 1))
+        for name, ftype, size, decimal in self.fields:
+            name = name.replace(' ', '_').encode().ljust(11, b'\x00')
+            self.dbf.write(pack('<11sc4xBB14x', name, ftype.encode(), size,
+                                decimal))
+        self.dbf.write(b'\r')
+
+    def poly(self, parts, *record):
+        """Write a polygon and its record.
+
+        :param parts: list of rings as list of (x, y, z).
+        :param record: values of the fields.
+        """
+        self.count += 1
+
+        # Geometry, with closed rings
+        parts = [part if part[0] == part[-1] else list(part) + [part[0]]
+                 for part in parts]
+        points = [p for part in parts for p in part]
+        xs, ys = [p[0] for p in points], [p[1] for p in points]
+        zs = [p[2] if len(p) > 2 else 0 for p in points]
+        bbox = [0] * 4
+        if points:
+            bbox = [min(xs), min(ys), max(xs), max(ys)]
+            extent = bbox + [min(zs), max(zs)]
+            if self.extent:
+                extent = [f(a, b) for f, a, b in zip(
+                    (min, min, max, max, min, max), self.extent, extent)]
+            self.extent = extent
+        index, n = list(), 0
+        for part in parts:
+            index.append(n)
+            n += len(part)
+        content = (pack('<i', POLYGON) + pack('<4d', *bbox) +
+                   pack('<2i', len(parts), len(points)) +
+                   pack('<{0}i'.format(len(index)), *index) +
+                   b''.join(pack('<2d', x, y) for x, y in zip(xs, ys)))
+        offset = self.shp.tell()
+        self.shp.write(pack('>2i', self.count, len(content) // 2) + content)
+        self.shx.write(pack('>2i', offset // 2, len(content) // 2))
+
+        # Attributes
+        self.dbf.write(b' ')  # deletion flag
+        for (name, ftype, size, decimal), value in zip(self.fields, record):
+            if ftype in ('N', 'F'):
+                if value is None or value == '':
+                    value = '*' * size
+                elif not decimal:
+                    try:
+                        value = int(value)
+                    except ValueError:
+                        value = int(float(value))
+                    value = format(value, 'd')[:size].rjust(size)
+                else:
+                    value = format(float(value), '.{0}f'.format(decimal))
+                    value = value[:size].rjust(size)
+            else:
+                value = str(value)[:size].ljust(size)
+            self.dbf.write(value.encode('utf-8'))
+
+    def close(self):
+        """Write the totals into the headers and close the files."""
+        for f in (self.shp, self.shx):
+            length = f.tell()
+            f.seek(0)
+            f.write(self.header(length))
+            f.close()
+        self.dbf_header()
+        self.dbf.close()
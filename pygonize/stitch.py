@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Stitch the polygons (or the segments) of the squares into contiguous
+polygons (or lines)."""
+
+
+from collections import defaultdict
+import math
+import warnings
+from shapely.geometry import Polygon
+from shapely.strtree import STRtree
+
+
+def signed_area(ring):
+    """Signed area of a ring (positive if counter-clockwise).
+
+    :param ring: list of (x, y, ...) without the closing point.
+    :return: number.
+    """
+    a = 0.
+    for (x1, y1), (x2, y2) in zip([p[:2] for p in ring],
+                                  [p[:2] for p in ring[1:] + ring[:1]]):
+        a += x1 * y2 - x2 * y1
+    return a / 2.
+
+
+def boundary_edges(rings):
+    """Edges of the boundary of the union of rings.
+
+    The rings must have the same orientation and share exactly their
+    vertices: an edge shared by two rings is found in both directions and is
+    removed.
+
+    :param rings: list of rings as list of vertices (without closing point).
+    :return: dictionary of the boundary edges as {start: [end, ...]}.
+    """
+    edges = defaultdict(int)
+    for ring in rings:
+        for a, b in zip(ring, ring[1:] + ring[:1]):
+            if edges.get((b, a)):
+                edges[(b, a)] -= 1
+            else:
+                edges[(a, b)] += 1
+
+    nexts = defaultdict(list)
+    for (a, b), n in edges.items():
+        nexts[a] += [b] * n
+    return nexts
+
+
+def next_edge(a, b, ends, clockwise):
+    """Choose the edge following (a, b) among the edges starting at b.
+
+    When rings touch at one point, the edge following the interior of the
+    ring is kept, so that every traced ring is simple.
+
+    :param a: start of the incoming edge.
+    :param b: end of the incoming edge.
+    :param ends: list of the ends of the edges starting at b.
+    :param clockwise: orientation of the rings.
+    :return: end of the following edge.
+    """
+    if len(ends) == 1:
+        return ends[0]
+    back = math.atan2(a[1] - b[1], a[0] - b[0])
+    rotation = list()
+    for c in ends:
+        delta = math.atan2(c[1] - b[1], c[0] - b[0]) - back
+        if not clockwise:
+            delta = -delta
+        rotation.append(delta % (2 * math.pi))
+    return ends[rotation.index(min(rotation))]
+
+
+def split_ring(ring):
+    """Split a ring touching itself into simple rings.
+
+    :param ring: list of vertices (without closing point).
+    :return: list of rings as list of vertices (without closing point).
+    """
+    rings = list()
+    path, pos = list(), dict()
+    for v in ring + ring[:1]:
+        if v in pos:  # close a ring
+            i = pos[v]
+            rings.append(path[i:])
+            for w in path[i + 1:]:
+                del pos[w]
+            del path[i + 1:]
+        else:
+            pos[v] = len(path)
+            path.append(v)
+    return rings
+
+
+def trace_rings(nexts, clockwise=True):
+    """Trace the rings from the boundary edges.
+
+    Each traced ring follows the boundary of one connected interior: when
+    rings touch at one point, the edge bounding the same interior is taken
+    (see ``next_edge``) and a ring touching itself is split into simple rings
+    (a shell and holes touching it).
+
+    :param nexts: boundary edges (see ``boundary_edges``).
+    :param clockwise: orientation of the rings.
+    :return: list of rings as list of vertices (without closing point).
+    """
+    rings = list()
+    visited = set()
+    for start in list(nexts):
+        for end in nexts[start]:
+            ring = list()
+            a, b = start, end
+            while (a, b) not in visited:
+                visited.add((a, b))
+                ring.append(a)
+                a, b = b, next_edge(a, b, nexts[b], clockwise)
+            if ring:
+                rings += split_ring(ring)
+    return rings
+
+
+def query_shapes(shapes, geoms):
+    """Shapes whose bounding box intersects the one of geometries.
+
+    :param shapes: list of shapely geometries.
+    :param geoms: list of shapely geometries.
+    :return: generator of the list of the index of the shapes, for each
+             geometry.
+    """
+    with warnings.catch_warnings():  # new interface of shapely 2
+        warnings.filterwarnings('ignore', 'STRtree', FutureWarning)
+        tree = STRtree(shapes)
+    index = {id(shape): i for i, shape in enumerate(shapes)}
+    for geom in geoms:
+        # shapes with shapely < 2, their index with shapely 2
+        found = tree.query(geom)
+        yield [index.get(id(c), c) for c in found]
+
+
+def stitch_polygons(rings, clockwise=True):
+    """Stitch rings sharing their edges into polygons with holes.
+
+    Exterior rings are clockwise and holes are counter-clockwise.
+
+    :param rings: list of rings with the same orientation, as list of
+                  (x, y, z) without closing point.
+    :param clockwise: orientation of the rings.
+    :return: list of (exterior, [hole, ...]).
+    """
+    rings = [ring for ring in rings if len(ring) >= 3]
+    boundaries = list()
+    for ring in trace_rings(boundary_edges(rings), clockwise):
+        if len(ring) >= 3:
+            area = signed_area(ring)
+            if area != 0:
+                boundaries.append((area, ring))
+    if not boundaries:
+        return []
+
+    # Exterior rings have the orientation of the rings of the squares
+    exteriors, holes = list(), list()
+    for area, ring in boundaries:
+        if (area < 0) == clockwise:
+            exteriors.append((abs(area), ring if area < 0 else ring[::-1]))
+        else:
+            holes.append(ring if area > 0 else ring[::-1])
+
+    # Put each hole in the smallest exterior ring containing it, among the
+    # exterior rings whose bounding box intersects the one of the hole
+    shapes = [Polygon(ring) for area, ring in exteriors]
+    interiors = [list() for e in exteriors]
+    if holes:
+        polys = [Polygon(hole) for hole in holes]
+        for hole, p, candidates in zip(holes, polys,
+                                       query_shapes(shapes, polys)):
+            for i in sorted(candidates, key=lambda i: exteriors[i][0]):
+                if shapes[i].contains(p):
+                    interiors[i].append(hole)
+                    break
+    return [(ring, interiors[i]) for i, (area, ring) in enumerate(exteriors)]
+
+
+def join_segments(segments):
+    """Join oriented segments sharing their ends into lines.
+
+    The lines start at the points where more segments start than end, the
+    remaining segments form closed lines.
+
+    :param segments: list of (start, end).
+    :return: list of lines as list of points (the last point of a closed
+             line is its first point).
+    """
+    nexts, balance = defaultdict(list), defaultdict(int)
+    for a, b in segments:
+        if a != b:
+            nexts[a].append(b)
+            balance[a] += 1
+            balance[b] -= 1
+
+    lines = list()
+    starts = [a for a in nexts if balance[a] > 0] + list(nexts)
+    for start in starts:
+        while nexts[start]:
+            line = [start]
+            while nexts[line[-1]]:
+                line.append(nexts[line[-1]].pop())
+            lines.append(line)
+    return lines
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Vectorized marching squares algorithm working on the whole grid."""
+
+
+import numpy
+from .interp import interpolate_coords
+from .marchingsquares import CASES, ISOLINE_CASES, Isoband, Isoline, \
+    make_isoband, remove_duplicate_coords
+from .stitch import join_segments, stitch_polygons
+
+
+def corners(a):
+    """Get the four corners of all the squares of a grid.
+
+    :param a: array with (y, x) shape.
+    :return: tuple of 4 arrays with (y - 1, x - 1) shape (p1, p2, p3, p4).
+    """
+    return a[:-1, :-1], a[:-1, 1:], a[1:, 1:], a[1:, :-1]
+
+
+def square_limits(z, nodata=None):
+    """Minimum and maximum of the corners of all the squares of a grid.
+
+    The squares with a missing corner have empty limits, so they cross no
+    isoband or isoline (see ``isoband_ranges``): NaN limits, or with integer
+    data and a nodata value, the maximum and the minimum of the type.
+
+    :param z: Z values with (y, x) shape.
+    :param nodata: value of the missing cells of integer data, or None.
+    :return: (zmin, zmax) arrays with (y - 1, x - 1) shape.
+    """
+    zc = corners(z)
+    zmin, zmax = numpy.minimum.reduce(zc), numpy.maximum.reduce(zc)
+    if nodata is not None:
+        missing = numpy.logical_or.reduce([c == nodata for c in zc])
+        info = numpy.iinfo(z.dtype)
+        zmin[missing], zmax[missing] = info.max, info.min
+    return zmin, zmax
+
+
+def isoband_index(z, lvlmn, lvlmx):
+    """Index of marching square algorithm for an isoband, as array.
+
+    :param z: array of values.
+    :param lvlmn: minimum value of an isoband (number or array).
+    :param lvlmx: maximal value of an isoband (number or array).
+    :return: array with 0 if z <= lvlmn, 2 if z >= lvlmx, 1 if z between.
+    """
+    return (z > lvlmn).astype(numpy.uint8) * (1 + (z >= lvlmx))
+
+
+def level_array(levels, dtype):
+    """Levels as an array of the type of the data, when it is exact.
+
+    With integer data and integer levels in the range of its type, the
+    levels are given in the type of the data, so that the comparisons and
+    the bucketing of the data do not promote it to float (the tests stay
+    exact and use less memory). With float32 data, the levels are rounded to
+    float32 and the data is compared and interpolated in float32. The other
+    levels are floats.
+
+    :param levels: sorted list of levels.
+    :param dtype: type of the data.
+    :return: array of levels.
+    """
+    levels = numpy.asarray(levels, dtype=float)
+    if numpy.issubdtype(dtype, numpy.floating):
+        return levels.astype(dtype)
+    if numpy.issubdtype(dtype, numpy.integer) and len(levels):
+        info = numpy.iinfo(dtype)
+        if (levels == numpy.round(levels)).all() and \
+                info.min <= levels[0] and levels[-1] <= info.max:
+            return levels.astype(dtype)
+    return levels
+
+
+def expand(first, count):
+    """Expand ranges of integers.
+
+    :param first: array of the first integer of each range.
+    :param count: array of the number of integers of each range.
+    :return: (owner, value) arrays with the index of the range and the
+             integer, for all the integers of all the ranges.
+    """
+    owner = numpy.repeat(numpy.arange(len(count)), count)
+    start = numpy.cumsum(count) - count
+    return owner, first[owner] + numpy.arange(len(owner)) - start[owner]
+
+
+def isoband_ranges(zmin, zmax, levels):
+    """Range of the isobands crossing data from their minimum and maximum.
+
+    The values are bucketed against the levels with ``numpy.digitize``. The
+    isoband between levels[i] and levels[i + 1] is crossed if zmax is greater
+    than levels[i] and zmin lower than levels[i + 1]. Empty limits (NaN, or
+    zmin greater than zmax) cross no isoband.
+
+    :param zmin: array of minimum values.
+    :param zmax: array of maximum values.
+    :param levels: sorted list of levels.
+    :return: (first, count) arrays with the index of the first isoband and
+             the number of isobands.
+    """
+    first = numpy.maximum(numpy.digitize(zmin, levels) - 1, 0)
+    last = numpy.minimum(numpy.digitize(zmax, levels, right=True) - 1,
+                         len(levels) - 2)
+    count = numpy.maximum(last - first + 1, 0)
+    count[zmin > zmax] = 0
+    return first, count
+
+
+def isoline_index(z, lvl):
+    """Index of marching square algorithm for an isoline, as array.
+
+    :param z: array of values.
+    :param lvl: level of the isoline (number or array).
+    :return: array with 0 if z < lvl, 1 otherwise.
+    """
+    return (z >= lvl).astype(numpy.uint8)
+
+
+def isoline_ranges(zmin, zmax, levels):
+    """Range of the isolines crossing data from their minimum and maximum.
+
+    The isoline of levels[i] is crossed if zmin is lower than levels[i] and
+    zmax greater than or equal to levels[i]. Empty limits (NaN, or zmin
+    greater than zmax) cross no isoline.
+
+    :param zmin: array of minimum values.
+    :param zmax: array of maximum values.
+    :param levels: sorted list of levels.
+    :return: (first, count) arrays with the index of the first isoline and
+             the number of isolines.
+    """
+    first = numpy.digitize(zmin, levels)
+    return first, numpy.maximum(numpy.digitize(zmax, levels) - first, 0)
+
+
+def edge_crossings(ca, cb, za, zb, levels, index=None, nodata=None):
+    """Interpolate the levels on edges.
+
+    Each edge is shared by two squares: the points are computed once per
+    level and edge, for the levels between the values of the edge only.
+
+    :param ca: coordinate of the 1st points of the edges (1 axis array).
+    :param cb: coordinate of the 2nd points of the edges (1 axis array).
+    :param za: Z values of the 1st points of the edges (1 axis array).
+    :param zb: Z values of the 2nd points of the edges (1 axis array).
+    :param levels: sorted array of levels (see ``level_array``), float32
+                   levels giving the interpolation in float32.
+    :param index: function giving the index in ca and cb of an array of
+                  index of edges, or None if ca and cb are given by edge.
+    :param nodata: value of the missing cells of integer data (their edges
+                   are not crossed), or None.
+    :return: (coords, base) with the coordinate of the points and, for each
+             edge, the index in coords of the point of a level less the index
+             of the level.
+    """
+    zmin, zmax = numpy.minimum(za, zb), numpy.maximum(za, zb)
+    first = numpy.digitize(zmin, levels, right=True)  # levels < zmin
+    count = numpy.digitize(zmax, levels) - first  # levels <= zmax
+    count[zmin == zmax] = 0
+    if nodata is not None:
+        count[(za == nodata) | (zb == nodata)] = 0
+    edge, lvl = expand(first, count)
+    ic = edge if index is None else index(edge)
+    dtype = levels.dtype if levels.dtype.kind == 'f' else float
+    coords = interpolate_coords(ca[ic], cb[ic], za[edge].astype(dtype),
+                                zb[edge].astype(dtype), levels[lvl])
+    base = numpy.cumsum(count) - count - first
+    return numpy.append(coords, numpy.nan), base
+
+
+def grid_crossings(x, y, z, levels, nodata=None):
+    """Points of the levels on the horizontal and vertical edges of a grid.
+
+    The horizontal edges are numbered row by row (nx - 1 per row) and the
+    vertical edges too (nx per row). The coordinates are only looked up for
+    the edges crossed by a level.
+
+    :param x: X coordinates as 1 axis array.
+    :param y: Y coordinates as 1 axis array.
+    :param z: Z values with (y, x) shape.
+    :param levels: sorted array of levels.
+    :param nodata: value of the missing cells of integer data, or None.
+    :return: (hx, vy) with the X coordinates on the horizontal edges and the
+             Y coordinates on the vertical edges (see ``edge_crossings``).
+    """
+    ny, nx = z.shape
+    x, y = numpy.asarray(x, dtype=float), numpy.asarray(y, dtype=float)
+    hx = edge_crossings(x[:-1], x[1:], z[:, :-1].ravel(), z[:, 1:].ravel(),
+                        levels, index=lambda edge: edge % (nx - 1),
+                        nodata=nodata)
+    vy = edge_crossings(y[:-1], y[1:], z[:-1, :].ravel(), z[1:, :].ravel(),
+                        levels, index=lambda edge: edge // nx, nodata=nodata)
+    return hx, vy
+
+
+def square_edges(iy, ix, nx):
+    """Index of the edges of squares (see ``grid_crossings``).
+
+    :param iy: row of the squares.
+    :param ix: column of the squares.
+    :param nx: number of points by row.
+    :return: (top, right, bottom, left) edges (see
+             ``marchingsquares.SQUARE_EDGES``).
+    """
+    return (iy * (nx - 1) + ix, iy * nx + ix + 1, (iy + 1) * (nx - 1) + ix,
+            iy * nx + ix)
+
+
+def edge_point(crossings, edge, level):
+    """Coordinate of the points of levels on edges.
+
+    :param crossings: (coords, base) of the edges (see ``edge_crossings``).
+    :param edge: index of the edges.
+    :param level: index of the levels.
+    :return: array of coordinates (meaningless for the edges not crossed by
+             the levels).
+    """
+    coords, base = crossings
+    return coords[numpy.clip(base[edge] + level, 0, len(coords) - 1)]
+
+
+def duplicate_squares(zc, lvlmn, lvlmx):
+    """Squares which can have duplicate vertices.
+
+    A point of a level on an edge is exactly a corner of the edge when the
+    level is the value of this corner (see ``interp.interpolate_coords``):
+    it is the only way for two vertices of a square to be at the same place.
+
+    :param zc: Z values of the corners as tuple of 4 arrays.
+    :param lvlmn: minimum of the isoband value (number or array).
+    :param lvlmx: maximum of the isoband value (number or array).
+    :return: boolean array, True for the squares with a corner value equal to
+             a level.
+    """
+    return numpy.logical_or.reduce([(e == lvlmn) | (e == lvlmx) for e in zc])
+
+
+def rectangle_fragments(x, y, z, rectangles, perimeter=False):
+    """Polygons of blocks of squares inside an isoband.
+
+    :param x: X coordinates as 1 axis array.
+    :param y: Y coordinates as 1 axis array.
+    :param z: Z values with (y, x) shape.
+    :param rectangles: (row0, row1, col0, col1) arrays with the index of the
+                       first and last points of the blocks.
+    :param perimeter: keep all the points of the grid on the edges of the
+                      blocks, to share them with the neighbour squares.
+    :return: list of polygons (as list of (x, y, z)) in the same orientation
+             than the squares.
+    """
+    fragments = list()
+    for r0, r1, c0, c1 in zip(*[r.tolist() for r in rectangles]):
+        if perimeter:
+            rows = numpy.concatenate([numpy.full(c1 - c0, r0),
+                                      numpy.arange(r0, r1),
+                                      numpy.full(c1 - c0, r1),
+                                      numpy.arange(r1, r0, -1)])
+            cols = numpy.concatenate([numpy.arange(c0, c1),
+                                      numpy.full(r1 - r0, c1),
+                                      numpy.arange(c1, c0, -1),
+                                      numpy.full(r1 - r0, c0)])
+        else:
+            rows = numpy.array([r0, r0, r1, r1])
+            cols = numpy.array([c0, c1, c1, c0])
+        ps = numpy.stack([x[cols], y[rows], z[rows, cols].astype(float)],
+                         axis=-1)
+        fragments.append([tuple(p) for p in ps.astype(float).tolist()])
+    return fragments
+
+
+def isoband_fragments(x, y, z, levels, couples=None, nodata=None):
+    """Vectorization of isobands, square by square.
+
+    The squares only visit the isobands between the minimum and the maximum
+    of their corners.
+
+    :param x: X coordinates as 1 axis array.
+    :param y: Y coordinates as 1 axis array.
+    :param z: Z values with (y, x) shape.
+    :param levels: sorted list of levels.
+    :param couples: (squares, bands) arrays with the flat index of the squares
+                    and the index of the isobands to vectorize, sorted by
+                    square then by isoband, or None for all the squares.
+    :param nodata: value of the missing cells of integer data, or None.
+    :return: (squares, bands, fragments) with the flat index of the squares,
+             the index of the isobands crossing them and, for each couple, a
+             list of polygons as list of (x, y, z). Couples are sorted by
+             square then by isoband.
+    """
+    x, y = numpy.asarray(x), numpy.asarray(y)
+    values = numpy.asarray(levels, dtype=float)  # Z of the points of levels
+    levels = level_array(levels, z.dtype)
+    ny, nx = z.shape
+
+    # Couples of squares and isobands crossing them
+    if couples is None:
+        zmin, zmax = square_limits(z, nodata)
+        first, count = isoband_ranges(zmin.ravel(), zmax.ravel(), levels)
+        couples = expand(first, count)
+    squares, bands = couples
+    if not len(squares):
+        return squares, bands, []
+    iy, ix = numpy.divmod(squares, nx - 1)
+    lvlmn, lvlmx = levels[bands], levels[bands + 1]
+
+    # Classification of the corners
+    x1, x2 = x[ix], x[ix + 1]
+    y1, y2 = y[iy], y[iy + 1]
+    z1, z2, z3, z4 = z[iy, ix], z[iy, ix + 1], z[iy + 1, ix + 1], z[iy + 1, ix]
+    code = sum(isoband_index(e, lvlmn, lvlmx) * k
+               for e, k in zip((z1, z2, z3, z4), (27, 9, 3, 1)))
+
+    # Saddles resolution (see ``saddle_index``)
+    mean = numpy.add.reduce([z1, z2, z3, z4], dtype=float) / 4.
+    isaddle = (mean >= lvlmn).astype(numpy.uint8) + (mean > lvlmx)
+
+    # Vertices of the squares (see ``marchingsquares.SQUARE_EDGES``): the
+    # corners then the points on the edges, shared with the neighbours
+    hx, vy = grid_crossings(x, y, z, levels, nodata)
+    top, right, bottom, left = square_edges(iy, ix, nx)
+    vmn, vmx = values[bands], values[bands + 1]
+    vertices = [(x1, y1, z1), (x2, y1, z2), (x2, y2, z3), (x1, y2, z4),
+                (edge_point(hx, top, bands), y1, vmn),
+                (edge_point(hx, top, bands + 1), y1, vmx),
+                (x2, edge_point(vy, right, bands), vmn),
+                (x2, edge_point(vy, right, bands + 1), vmx),
+                (edge_point(hx, bottom, bands), y2, vmn),
+                (edge_point(hx, bottom, bands + 1), y2, vmx),
+                (x1, edge_point(vy, left, bands), vmn),
+                (x1, edge_point(vy, left, bands + 1), vmx)]
+    vertices = numpy.stack([numpy.stack(v, axis=-1) for v in vertices],
+                           axis=1).tolist()
+    duplicates = duplicate_squares((z1, z2, z3, z4), lvlmn, lvlmx).tolist()
+
+    fragments = list()
+    for i, (c, s) in enumerate(zip(code.tolist(), isaddle.tolist())):
+        vs = vertices[i]
+        parts = [[tuple(vs[v]) for v in part]
+                 for part in CASES[c].polygons[s]]
+        if duplicates[i]:
+            parts = [remove_duplicate_coords(ps) for ps in parts]
+        fragments.append(parts)
+    return squares, bands, fragments
+
+
+def vectorize_isobands(x, y, z, levels, stitch=False, pyramid=None,
+                       nodata=None):
+    """Vectorization of isobands on the whole grid.
+
+    Without stitching, polygons are returned in the same order than with
+    squares: squares from upper-left to lower-right, then isobands from the
+    lowest to the highest. With stitching, the polygons of the squares are
+    assembled into one polygon (with holes) per connected region, isoband by
+    isoband.
+
+    With a min/max pyramid of the grid, the blocks of squares outside an
+    isoband are skipped and the blocks inside an isoband give one rectangle
+    (at the place of their upper-left square) without visiting their squares.
+
+    :param x: X coordinates as 1 axis array.
+    :param y: Y coordinates as 1 axis array.
+    :param z: Z values with (y, x) shape.
+    :param levels: list of levels.
+    :param stitch: stitch the polygons of the squares.
+    :param pyramid: ``pyramid.Pyramid`` object of z or None.
+    :param nodata: value of the missing cells of integer data, or None (the
+                   squares with a missing corner have no polygon).
+    :return: list of Isoband objects.
+    """
+    return list(iter_isobands(x, y, z, levels, stitch=stitch,
+                              pyramid=pyramid, nodata=nodata))
+
+
+def iter_isobands(x, y, z, levels, stitch=False, pyramid=None, nodata=None):
+    """Vectorization of isobands on the whole grid, as a generator.
+
+    The polygons are the ones of ``vectorize_isobands``, in the same order.
+    The squares are vectorized at once for all the levels; with stitching,
+    the polygons are then stitched isoband by isoband as they are consumed.
+
+    :param x: X coordinates as 1 axis array.
+    :param y: Y coordinates as 1 axis array.
+    :param z: Z values with (y, x) shape.
+    :param levels: list of levels.
+    :param stitch: stitch the polygons of the squares.
+    :param pyramid: ``pyramid.Pyramid`` object of z or None.
+    :param nodata: value of the missing cells of integer data, or None.
+    :return: generator of Isoband objects.
+    """
+    levels = sorted(levels)
+    if pyramid is None:
+        squares, bands, fragments = isoband_fragments(x, y, z, levels,
+                                                      nodata=nodata)
+    else:
+        rectangles, squares, bands = pyramid.isobands(levels)
+        squares, bands, fragments = isoband_fragments(
+            x, y, z, levels, (squares, bands), nodata=nodata)
+        if len(rectangles[0]):
+            x, y = numpy.asarray(x), numpy.asarray(y)
+            rows, cols, bands2 = rectangles[0], rectangles[2], rectangles[4]
+            squares = numpy.concatenate([squares,
+                                         rows * (len(x) - 1) + cols])
+            bands = numpy.concatenate([bands, bands2])
+            fragments += [[ps] for ps in rectangle_fragments(
+                x, y, z, rectangles[:4], perimeter=stitch)]
+            order = numpy.lexsort((bands, squares))
+            squares, bands = squares[order], bands[order]
+            fragments = [fragments[i] for i in order]
+
+    # Orientation of the rings of the cases (see ``Square.clockwise``)
+    clockwise = None
+    if fragments:
+        clockwise = (x[1] - x[0]) * (y[1] - y[0]) < 0
+    if stitch:
+        order = numpy.argsort(bands, kind='stable')
+        split = numpy.flatnonzero(numpy.diff(bands[order])) + 1
+        for group in numpy.split(order, split) if len(order) else []:
+            band = int(bands[group[0]])
+            rings = [part for i in group for part in fragments[i]]
+            for i in group:
+                fragments[i] = None  # released as the isobands are done
+            for shell, holes in stitch_polygons(rings, clockwise):
+                yield Isoband(shell, holes).set_band(levels[band],
+                                                     levels[band + 1], band)
+        return
+
+    for band, parts in zip(bands.tolist(), fragments):
+        for part in parts:
+            poly = make_isoband(part, clockwise=clockwise)
+            if poly:
+                yield poly.set_band(levels[band], levels[band + 1], band)
+
+
+def isoline_segments(x, y, z, levels, nodata=None):
+    """Vectorization of isolines, square by square.
+
+    :param x: X coordinates as 1 axis array.
+    :param y: Y coordinates as 1 axis array.
+    :param z: Z values with (y, x) shape.
+    :param levels: sorted list of levels.
+    :param nodata: value of the missing cells of integer data, or None.
+    :return: (lines, segments) with, for each segment, the index of its
+             level and its two points as (x, y, z).
+    """
+    x, y = numpy.asarray(x), numpy.asarray(y)
+    values = numpy.asarray(levels, dtype=float)  # Z of the points of levels
+    levels = level_array(levels, z.dtype)
+    ny, nx = z.shape
+
+    # Couples of squares and isolines crossing them
+    zmin, zmax = square_limits(z, nodata)
+    first, count = isoline_ranges(zmin.ravel(), zmax.ravel(), levels)
+    squares, lines = expand(first, count)
+    if not len(squares):
+        return lines, []
+    iy, ix = numpy.divmod(squares, nx - 1)
+    lvl = levels[lines]
+
+    # Classification of the corners and saddles resolution
+    z1, z2, z3, z4 = z[iy, ix], z[iy, ix + 1], z[iy + 1, ix + 1], z[iy + 1, ix]
+    code = sum(isoline_index(e, lvl) * k
+               for e, k in zip((z1, z2, z3, z4), (8, 4, 2, 1)))
+    icenter = isoline_index(numpy.add.reduce([z1, z2, z3, z4],
+                                             dtype=float) / 4., lvl)
+
+    # Points of the isolines on the edges of the squares
+    hx, vy = grid_crossings(x, y, z, levels, nodata)
+    top, right, bottom, left = square_edges(iy, ix, nx)
+    x1, x2, y1, y2 = x[ix], x[ix + 1], y[iy], y[iy + 1]
+    value = values[lines]
+    vertices = [(edge_point(hx, top, lines), y1, value),
+                (x2, edge_point(vy, right, lines), value),
+                (edge_point(hx, bottom, lines), y2, value),
+                (x1, edge_point(vy, left, lines), value)]
+    vertices = numpy.stack([numpy.stack(v, axis=-1) for v in vertices],
+                           axis=1).tolist()
+
+    out, segments = list(), list()
+    for i, (c, s) in enumerate(zip(code.tolist(), icenter.tolist())):
+        for ea, eb in ISOLINE_CASES[c].segments[s]:
+            out.append(i)
+            segments.append((tuple(vertices[i][ea]), tuple(vertices[i][eb])))
+    return lines[out], segments
+
+
+def vectorize_isolines(x, y, z, levels, nodata=None):
+    """Vectorization of isolines on the whole grid.
+
+    The segments of the squares are joined into lines, level by level. The
+    values greater than the isoline are on the same side of all the lines
+    (see ``marchingsquares.isoline_case``).
+
+    :param x: X coordinates as 1 axis array.
+    :param y: Y coordinates as 1 axis array.
+    :param z: Z values with (y, x) shape.
+    :param levels: list of levels.
+    :param nodata: value of the missing cells of integer data, or None.
+    :return: list of Isoline objects, sorted by level.
+    """
+    levels = sorted(levels)
+    lines, segments = isoline_segments(x, y, z, levels, nodata)
+
+    out = list()
+    order = numpy.argsort(lines, kind='stable')
+    split = numpy.flatnonzero(numpy.diff(lines[order])) + 1
+    for group in numpy.split(order, split) if len(order) else []:
+        out += [Isoline(line)
+                for line in join_segments([segments[i] for i in group])]
+    return out
@@ -15,5 +15,6 @@ setup(name='pygonize',
       author='jnth',
       author_email='jonathan.virga@gmail.com',
       packages=['pygonize'],
+      python_requires='>=3.8',
       install_requires=req
       )
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Test of the compact collection of isobands."""
+
+import sys
+sys.path.append('../pygonize')
+import pickle
+import unittest
+import numpy
+from pygonize.collection import IsobandCollection
+from pygonize.marchingsquares import Isoband
+from test_base_class import PygonizeTest
+
+
+class TestIsobandCollection(PygonizeTest):
+    """Test of ``collection`` module."""
+
+    def setUp(self):
+        """Define polygons."""
+        self.levels = [10, 20, 30]
+        self.polys = [
+            Isoband([(0, 0, 10), (0, 2, 12), (3, 1, 11)]),
+            Isoband([(5, 5, 20), (5, 9, 25), (9, 9, 30), (9, 5, 20)],
+                    [[(6, 6, 22), (8, 6, 22), (8, 8, 22)]]),
+            Isoband([(1, 3, 15), (2, 4, 20), (1, 4, 20)])]
+
+    def test_from_polygons(self):
+        """Test of ``from_polygons``."""
+        c = IsobandCollection.from_polygons(iter(self.polys), self.levels)
+        self.assertEqual(len(c), 3)
+        self.assertEqual(c.coords.shape, (13, 3))
+        self.assertEqual(c.ring_offsets.tolist(), [0, 3, 7, 10, 13])
+        self.assertEqual(c.poly_offsets.tolist(), [0, 1, 3, 4])
+        self.assertEqual(c.bands.tolist(), [0, 1, 0])
+        self.assertEqual(c.lvlmn.tolist(), [10, 20, 10])
+        self.assertEqual(c.lvlmx.tolist(), [20, 30, 20])
+        for poly, expected in zip(c, self.polys):
+            self.assertIsInstance(poly, Isoband)
+            self.assertTrue(poly.equals(expected))
+            self.assertEqual(poly.z_max, expected.z_max)
+        self.assertEqual(len(c[1].interiors), 1)
+
+        c = IsobandCollection.from_polygons(self.polys, self.levels,
+                                            bands=[1, 1, 1])
+        self.assertEqual(c.bands.tolist(), [1, 1, 1])
+        c = IsobandCollection.from_polygons([], self.levels)
+        self.assertEqual(len(c), 0)
+        self.assertEqual(c.coords.shape, (0, 3))
+
+    def test_getitem(self):
+        """Test of the index, slices and masks."""
+        c = IsobandCollection.from_polygons(self.polys, self.levels)
+        self.assertTrue(c[-1].equals(self.polys[2]))
+        with self.assertRaises(IndexError):
+            c[3]
+        sub = c[1:]
+        self.assertIsInstance(sub, IsobandCollection)
+        self.assertEqual(sub.bands.tolist(), [1, 0])
+        self.assertEqual(sub.ring_offsets.tolist(), [0, 4, 7, 10])
+        self.assertTrue(sub[0].equals(self.polys[1]))
+        sub = c[c.bands == 0]
+        self.assertEqual(len(sub), 2)
+        self.assertTrue(sub[1].equals(self.polys[2]))
+        self.assertEqual(len(c[numpy.array([], dtype=int)]), 0)
+
+    def test_float32(self):
+        """Coordinates in float32, relative to the 1st point."""
+        polys = [Isoband([(x + 898879.3, y + 6317011.7, z)
+                          for x, y, z in poly.exterior.coords])
+                 for poly in self.polys]
+        c = IsobandCollection.from_polygons(polys, self.levels,
+                                            dtype=numpy.float32)
+        self.assertEqual(c.coords.dtype, numpy.float32)
+        self.assertEqual(c.origin.tolist(), list(polys[0].exterior.coords[0]))
+        for sub in (c, c[1:]):
+            for poly, expected in zip(sub, polys[-len(sub):]):
+                self.assertLess(abs(numpy.subtract(
+                    poly.exterior.coords, expected.exterior.coords)).max(),
+                    1e-5)
+        self.assertLess(c.nbytes, IsobandCollection.from_polygons(
+            polys, self.levels).nbytes)
+        with self.assertRaises(ValueError):
+            IsobandCollection.from_polygons(polys, self.levels, dtype=int)
+
+    def test_pickle(self):
+        """Pickled collection."""
+        c = IsobandCollection.from_polygons(self.polys, self.levels)
+        c2 = pickle.loads(pickle.dumps(c))
+        self.assertEqual(c2.coords.tolist(), c.coords.tolist())
+        self.assertEqual(c2.bands.tolist(), c.bands.tolist())
+        self.assertEqual(c2.nbytes, c.nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,9 @@
 
 import sys
 sys.path.append('../pygonize')
+import pickle
 import unittest
+import numpy
 from shapely.geometry import Point, Polygon
 from pygonize import marchingsquares, interp
 from test_base_class import PygonizeTest
@@ -52,6 +54,13 @@ class TestBaseFunctions(PygonizeTest):
         self.valid_point(new[0], self.p3)
         self.valid_point(new[1], self.p1)
         self.valid_point(new[2], self.p2)
+        self.assertIs(new[0], self.p3)  # same objects
+
+    def test_remove_duplicate_coords(self):
+        """Test of ``remove_duplicate_coords``."""
+        ps = [(6, 11, 40), (2, 11, 50), (6, 11, 40), (2, 11, 40), (2, 11, 50)]
+        self.assertEqual(marchingsquares.remove_duplicate_coords(ps),
+                         [(6, 11, 40), (2, 11, 50), (2, 11, 40)])
 
     def test_interpolate(self):
         """Test of ``interpolate``."""
@@ -65,6 +74,29 @@ class TestBaseFunctions(PygonizeTest):
         self.assertIsNone(interp.interpolate(self.p1, self.p2, 35))
         self.assertIsNone(interp.interpolate(self.p1, self.p2, 55))
 
+    def test_interpolate_array(self):
+        """Test of ``interpolate_array``."""
+        pa = [(2, 11, 50), (2, 11, 50), (6, 11, 40), (0, 0, 5), (0, 0, 5)]
+        pb = [(6, 11, 40), (6, 11, 40), (2, 11, 50), (0, 1, 5), (3, 0, 7)]
+        out = interp.interpolate_array(pa, pb, [46, 40, 46, 5, 8])
+        self.assertEqual(out.shape, (5, 3))
+        self.valid_list(out[0], (3.6, 11, 46))
+        self.assertEqual(out[1].tolist(), [6, 11, 40])  # exact end
+        self.assertEqual(out[2].tolist(), out[0].tolist())
+        self.assertEqual(out[3].tolist(), [0, 0, 5])  # flat edge
+        self.assertTrue(numpy.isnan(out[4]).all())  # outside
+        out = interp.interpolate_array(pa[:2], pb[:2], 45)
+        self.valid_list(out[:, 0], (4, 4))
+
+    def test_interpolate_coords(self):
+        """Test of ``interpolate_coords``."""
+        c = interp.interpolate_coords(numpy.array([2., 6.]),
+                                      numpy.array([6., 2.]),
+                                      numpy.array([50., 40.]),
+                                      numpy.array([40., 50.]), 46)
+        self.valid_list(c, [3.6, 3.6])
+        self.assertEqual(c[0], c[1])  # same point whatever the direction
+
     def test_isoband_on_edge(self):
         """Test of ``isoband_on_edge``."""
         p1 = Point(10, 10, 5)
@@ -137,6 +169,22 @@ class TestMarchingSquares(PygonizeTest):
         self.valid_list(sq.z, [15, 20, 18, 29])
         self.assertEqual(sq.centralmean, 20.5)
 
+    def test_init_errors(self):
+        """Test of ``init`` with 2d points."""
+        with self.assertRaises(marchingsquares.SquareError):
+            marchingsquares.Square(self.p1, Point(12, 14), self.p3, self.p4)
+
+    def test_from_coords(self):
+        """Test of ``from_coords``."""
+        sq = marchingsquares.Square.from_coords((10, 12, 15), (12, 14, 20),
+                                                (15, 14, 18), (11, 15, 29))
+        self.assertEqual(sq.z, (15, 20, 18, 29))
+        self.assertFalse(hasattr(sq, '__dict__'))  # slots
+        self.valid_point(sq.p3, (15, 14, 18))
+        self.assertIs(sq.edges[1][1], sq.p3)  # points created once
+        self.assertEqual(sq.isoband_code(16, 20), 23)
+        self.assertEqual(sq.isoband_classif(16, 20), '0212')
+
     def test_egdes(self):
         """Test of ``egdes`` property."""
         sq = marchingsquares.Square(self.p1, self.p2, self.p3, self.p4)
@@ -172,6 +220,14 @@ class TestMarchingSquares(PygonizeTest):
         self.assertEqual(sq.isoband_classif(19, 25), "0102")
         self.assertEqual(sq.isoband_classif(25, 30), "0001")
 
+    def test_isoband_code(self):
+        """Test of ``isoband_code`` method."""
+        sq = marchingsquares.Square(self.p1, self.p2, self.p3, self.p4)
+        self.assertEqual(sq.isoband_code(10, 12), 80)
+        self.assertEqual(sq.isoband_code(55, 60), 0)
+        self.assertEqual(sq.isoband_code(16, 20), 23)
+        self.assertEqual(sq.isoband_code(19, 25), 11)
+
     def test_make_polygon(self):
         """Test of ``make_polygon`` method."""
         self.assertIsNone(marchingsquares.make_polygon())
@@ -191,6 +247,29 @@ class TestMarchingSquares(PygonizeTest):
                         [[10, 12, 15], [11, 15, 29], [15, 14, 18], [12, 14, 20],
                          [10, 12, 15]])
 
+        # known orientation
+        poly = marchingsquares.make_polygon(self.p4, self.p3, self.p2,
+                                            clockwise=False)
+        self.valid_poly(poly, [[11, 15, 29], [12, 14, 20], [15, 14, 18],
+                               [11, 15, 29]])
+        poly = marchingsquares.make_polygon(self.p4, self.p3, self.p2,
+                                            clockwise=True)
+        self.valid_poly(poly, [[11, 15, 29], [15, 14, 18], [12, 14, 20],
+                               [11, 15, 29]])
+
+    def test_clockwise(self):
+        """Test of ``clockwise`` property."""
+        p1, p2 = Point(10, 20, 1), Point(20, 20, 2)
+        p3, p4 = Point(20, 10, 3), Point(10, 10, 4)
+        sq = marchingsquares.Square(p1, p2, p3, p4)
+        self.assertTrue(sq.clockwise)
+        sq = marchingsquares.Square(p4, p3, p2, p1)  # Y increasing
+        self.assertFalse(sq.clockwise)
+        polys = sq.vectorize_isobands([1.5, 2.5, 3.5])
+        self.assertEqual(len(polys), 2)
+        self.assertTrue(all(marchingsquares.is_clockwise(poly)
+                            for poly in polys))
+
 
 class TestVectorizeIsoband(PygonizeTest):
     """Test to vectorize isoband."""
@@ -1195,6 +1274,113 @@ class TestVectorizeIsoband(PygonizeTest):
                         [[20, 14.17, 20], [20, 11.39, 10], [18.15, 10, 10],
                          [14.44, 10, 20], [20, 14.17, 20]])
 
+    def test_vectorize_2020d(self):
+        """Test the `2020d` case with values equal to the levels."""
+        cl, poly = self.init_point(20, -10, 20, 0, 10, 20)
+        self.assertEqual(cl, '2020')
+        self.assertEqual(len(poly), 2)
+        self.valid_poly(poly[0],
+                        [[10, 20, 20], [13.33, 20, 10], [10, 15, 10],
+                         [10, 20, 20]])
+        self.valid_poly(poly[1],
+                        [[20, 13.33, 10], [20, 10, 20], [15, 10, 10],
+                         [20, 13.33, 10]])
+
+
+class TestIsobandCases(PygonizeTest):
+    """Test of the marching squares cases."""
+
+    def test_cases(self):
+        """Test of ``CASES``."""
+        self.assertEqual(len(marchingsquares.CASES), 81)
+        for code, case in enumerate(marchingsquares.CASES):
+            self.assertEqual(int(case.idx, 3), code)
+        self.assertEqual(marchingsquares.CASES[0].polygons, ())
+        self.assertEqual(marchingsquares.CASES[80].polygons, ())
+        self.assertEqual(len([c for c in marchingsquares.CASES if c.saddle]),
+                         14)
+
+    def test_case_1111(self):
+        """Test of the `1111` case."""
+        case = marchingsquares.CASES[40]
+        self.assertEqual(case.idx, '1111')
+        self.assertEqual(case.edges, ((0, 1), (1, 2), (2, 3), (3, 0)))
+        self.assertEqual(case.polygons[1], ((0, 1, 2, 3), ))
+        self.assertFalse(case.saddle)
+
+    def test_case_2020(self):
+        """Test of the `2020` case."""
+        case = marchingsquares.CASES[60]
+        self.assertEqual(case.idx, '2020')
+        self.assertEqual(case.edges, ((5, 4), (6, 7), (9, 8), (10, 11)))
+        self.assertEqual(case.polygons[0], ((5, 4, 10, 11), (6, 7, 9, 8)))
+        self.assertEqual(case.polygons[1], ((5, 4, 6, 7, 9, 8, 10, 11), ))
+        self.assertEqual(case.polygons[2], ((5, 4, 6, 7), (9, 8, 10, 11)))
+        self.assertTrue(case.saddle)
+
+    def test_saddle_index(self):
+        """Test of ``saddle_index``."""
+        self.assertEqual(marchingsquares.saddle_index(5, 10, 20), 0)
+        self.assertEqual(marchingsquares.saddle_index(10, 10, 20), 1)
+        self.assertEqual(marchingsquares.saddle_index(20, 10, 20), 1)
+        self.assertEqual(marchingsquares.saddle_index(25, 10, 20), 2)
+
+
+class TestIsolineCases(PygonizeTest):
+    """Test of the marching squares cases of isolines."""
+
+    def test_cases(self):
+        """Test of ``ISOLINE_CASES``."""
+        cases = marchingsquares.ISOLINE_CASES
+        self.assertEqual(len(cases), 16)
+        for code, case in enumerate(cases):
+            self.assertEqual(int(case.idx, 2), code)
+        self.assertEqual(cases[0].segments, ((), ()))
+        self.assertEqual(cases[15].segments, ((), ()))
+        self.assertEqual(cases[8].segments, (((0, 3), ), ((0, 3), )))
+        self.assertEqual(cases[7].segments, (((3, 0), ), ((3, 0), )))
+        self.assertEqual([c.idx for c in cases if c.saddle], ['0101', '1010'])
+        self.assertEqual(cases[10].segments,
+                         (((0, 3), (2, 1)), ((0, 1), (2, 3))))
+
+
+class TestVectorizeIsolines(PygonizeTest):
+    """Test to vectorize isolines."""
+
+    def init_point(self, z1, z2, z3, z4):
+        """Define the 4 points for the test and create a Square."""
+        self.sq = marchingsquares.Square(Point(10, 20, z1), Point(20, 20, z2),
+                                         Point(20, 10, z3), Point(10, 10, z4))
+
+    def test_isoline_code(self):
+        """Test of ``Square.isoline_code``."""
+        self.init_point(50, 40, 42, 45)
+        self.assertEqual(self.sq.isoline_code(45), 9)
+        self.assertEqual(self.sq.isoline_code(40), 15)
+        self.assertEqual(self.sq.isoline_code(60), 0)
+
+    def test_vectorize_isoline(self):
+        """Test of ``Square.vectorize_isoline``."""
+        self.init_point(50, 40, 42, 45)
+        lines = self.sq.vectorize_isoline(44)
+        self.assertEqual(len(lines), 1)
+        self.valid_list(lines[0].coords[0], [16, 20, 44])
+        self.valid_list(lines[0].coords[1], [13.33, 10, 44])
+        self.assertIsNone(self.sq.vectorize_isoline(40))  # on a corner
+        self.assertIsNone(self.sq.vectorize_isoline(60))
+
+    def test_vectorize_isoline_saddle(self):
+        """Test of ``Square.vectorize_isoline`` with a saddle."""
+        self.init_point(20, 0, 20, 0)
+        lines = self.sq.vectorize_isoline(5)  # central value above
+        self.assertEqual([line.coords[:] for line in lines],
+                         [[(17.5, 20, 5), (20, 17.5, 5)],
+                          [(12.5, 10, 5), (10, 12.5, 5)]])
+        lines = self.sq.vectorize_isoline(15)  # central value below
+        self.assertEqual([line.coords[:] for line in lines],
+                         [[(12.5, 20, 15), (10, 17.5, 15)],
+                          [(17.5, 10, 15), (20, 12.5, 15)]])
+
 
 class TestVectorizeIsobands(PygonizeTest):
     """Test to vectorize isobands."""
@@ -1227,6 +1413,21 @@ class TestVectorizeIsobands(PygonizeTest):
         self.valid_poly(polys[1], [[14, 20, 46], [16, 20, 44], [13.33, 10, 44],
                                    [10, 10, 45],
                                    [10, 12, 46], [14, 20, 46]])
+        self.assertEqual([(p.band, p.lvlmn, p.lvlmx) for p in polys],
+                         [(0, 42, 44), (1, 44, 46)])
+
+    def test_isoband_band(self):
+        """Band of the isobands, kept by pickle."""
+        self.init_point(50, 40, 42, 45)
+        poly = self.sq.vectorize_isobands([30, 42, 44, 46])[1]
+        self.assertEqual((poly.band, poly.lvlmn, poly.lvlmx), (1, 42, 44))
+        self.assertEqual((poly.z_min, poly.z_max), (42, 44))
+        poly2 = pickle.loads(pickle.dumps(poly))
+        self.assertIsInstance(poly2, marchingsquares.Isoband)
+        self.assertTrue(poly2.equals(poly))
+        self.assertEqual((poly2.band, poly2.lvlmn, poly2.lvlmx), (1, 42, 44))
+        self.assertIsNone(marchingsquares.Isoband([(0, 0), (1, 0),
+                                                   (1, 1)]).band)
 
     def test_vectorize_multiple_levels_2(self):
         """Test to vectorize with multiple levels #2."""
@@ -1290,6 +1491,11 @@ class TestVectorizeIsobands(PygonizeTest):
         self.valid_poly(polys[4], [[10, 20, 50], [12, 20, 48], [10, 16, 48],
                                    [10, 20, 50]])
 
+    def test_vectorize_missing(self):
+        """No isoband in a square with a missing corner."""
+        self.init_point(50, float('nan'), 42, 45)
+        self.assertEqual(self.sq.vectorize_isobands([0, 45, 100]), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -6,9 +6,16 @@
 import sys
 
 sys.path.append('../pygonize')
+import concurrent.futures
+import logging
+import multiprocessing
+import subprocess
 import tempfile
+import types
 import unittest
+from unittest import mock
 import numpy
+import rasterio
 import shapefile
 import pygonize
 from test_base_class import PygonizeTest
@@ -78,6 +85,59 @@ class TestPygonize(PygonizeTest):
         self.assertEqual(p.ly.tolist(), self.npy.tolist())
         self.assertEqual(p.z.tolist(), self.npz.tolist())
 
+    def test_log_values(self):
+        z = self.npz.astype(float)
+        z[0, 0] = numpy.nan
+        p = pygonize.Pygonize()
+        log = pygonize.pygonize.log
+        with self.assertLogs(log, logging.DEBUG) as cm:
+            p.read_array(self.npx, self.npy, z)
+        self.assertIn("DEBUG:pygonize.pygonize:data value from 20.00 to "
+                      "47.00", cm.output)
+        self.assertIn("DEBUG:pygonize.pygonize:1 missing values", cm.output)
+        with mock.patch.object(log, 'isEnabledFor', return_value=False), \
+                mock.patch('numpy.isnan') as m:
+            p.read_array(self.npx, self.npy, z)
+        m.assert_not_called()  # no scan of the data without debug logs
+
+    def test_read_npy(self):
+        fn = tempfile.NamedTemporaryFile(suffix='.npy').name
+        numpy.save(fn, self.npz)
+        p = pygonize.Pygonize()
+        p.read_npy(fn, self.npx, self.npy.tolist())
+        self.assertIsInstance(p.z, numpy.memmap)
+        self.assertEqual(p.z.tolist(), self.npz.tolist())
+        self.assertEqual(p.ly.tolist(), self.npy.tolist())
+        self.assertIsNone(p.tilesize)
+        self.assertEqual(p._tilesize(False),
+                         (2 ** 20 // (len(self.npx) - 1), len(self.npx) - 1))
+        self.assertIsNone(p._tilesize(True))
+        levels = [40, 45, 50]
+        polys = p.vectorize_isobands(levels, engine='numpy')
+        q = pygonize.Pygonize()
+        q.read_array(x=self.npx, y=self.npy, z=self.npz)
+        ref = q.vectorize_isobands(levels, engine='numpy')
+        self.assertEqual([tuple(poly.exterior.coords) for poly in polys],
+                         [tuple(poly.exterior.coords) for poly in ref])
+
+        p = pygonize.Pygonize()
+        p.read_npy(fn, self.npx, self.npy, mmap_mode=None)
+        self.assertNotIsInstance(p.z, numpy.memmap)
+        self.assertIsNone(p._tilesize(False))
+
+    def test_read_npy_then_array(self):
+        fn = tempfile.NamedTemporaryFile(suffix='.npy').name
+        numpy.save(fn, self.npz)
+        levels = [40, 45, 50]
+        p = pygonize.Pygonize()
+        p.read_npy(fn, self.npx, self.npy)
+        ref = p.vectorize_isobands(levels, engine='numpy', stitch=True)
+        p.read_array(self.npx, self.npy, self.npz)
+        self.assertIsNone(p._tilesize(False))
+        polys = p.vectorize_isobands(levels, engine='numpy', stitch=True)
+        self.assertEqual([poly.wkt for poly in polys],
+                         [poly.wkt for poly in ref])
+
     def test_read_raster(self):
         # Raster information...
         x0, y0 = 898879, 6317011
@@ -97,6 +157,14 @@ class TestPygonize(PygonizeTest):
                          numpy.arange(y0 - dy / 2., y0 - dy * ny, -dy).tolist())
         self.assertEqual(p.z.tolist(), dat)
 
+    def test_cell_centers(self):
+        self.assertEqual(pygonize.pygonize.cell_centers(10, -2, 3).tolist(),
+                         [9, 7, 5])
+        for n in (1, 7, 1000, 99999):
+            lx = pygonize.pygonize.cell_centers(898879.3, 0.1, n)
+            self.assertEqual(len(lx), n)
+            self.assertAlmostEqual(lx[-1], 898879.3 + (n - 0.5) * 0.1)
+
     def test_vectorize_isobands_from_array_1(self):
         p = pygonize.Pygonize()
         p.read_array(x=self.npx, y=self.npy, z=self.npz)
@@ -257,6 +325,361 @@ class TestPygonize(PygonizeTest):
         self.assertEqual(len(polys), 32)
         self.valid_with_file(polys, 'test/data/isoband_from_raster_1.txt')
 
+    def test_vectorize_isobands_from_raster_1_numpy(self):
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        polys = p.vectorize_isobands([200, 250, 300, 350, 400, 450, 500],
+                                     engine='numpy')
+        self.assertEqual(len(polys), 32)
+        self.valid_with_file(polys, 'test/data/isoband_from_raster_1.txt')
+
+    def test_vectorize_isobands_chunksize(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        for chunksize in (1, 3, 10):
+            p = pygonize.Pygonize(chunksize=chunksize)
+            p.read_raster('test/data/raster.tif')
+            polys = p.vectorize_isobands(levels)
+            self.valid_with_file(polys, 'test/data/isoband_from_raster_1.txt')
+
+    def test_tiles(self):
+        self.assertEqual(list(pygonize.pygonize.tiles((4, 6), (2, 3))),
+                         [(0, 2, 0, 3), (0, 2, 3, 5), (2, 3, 0, 3),
+                          (2, 3, 3, 5)])
+        self.assertEqual(list(pygonize.pygonize.tiles((3, 3), (5, 5))),
+                         [(0, 2, 0, 2)])
+        self.assertEqual(list(pygonize.pygonize.tiles((1, 3), (5, 5))), [])
+
+    def test_vectorize_isobands_tiles(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        ref = p.vectorize_isobands(levels)
+        for tilesize in (4, (3, 7)):
+            p = pygonize.Pygonize(tilesize=tilesize)
+            p.read_raster('test/data/raster.tif')
+            polys = p.vectorize_isobands(levels)
+            self.assertEqual(len(polys), len(ref))
+            self.assertEqual(sorted(tuple(poly.exterior.coords)
+                                    for poly in polys),
+                             sorted(tuple(poly.exterior.coords)
+                                    for poly in ref))
+            polys = p.vectorize_isobands(levels, engine='numpy')
+            self.assertAlmostEqual(sum(poly.area for poly in polys), 10000)
+            self.assertTrue(all(poly.is_valid for poly in polys))
+
+        p = pygonize.Pygonize(tilesize=4)
+        p.read_raster('test/data/raster.tif')
+        with self.assertRaises(ValueError):
+            p.vectorize_isobands(levels, engine='numpy', stitch=True)
+        p.tilesize = (0, 4)
+        with self.assertRaises(ValueError):
+            p.vectorize_isobands(levels)
+
+    def test_read_raster_stream(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        ref = p.vectorize_isobands(levels)
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif', stream=True)
+        self.assertIsNone(p.tilesize)
+        self.assertEqual(p._tilesize(False), (4, 4))
+        self.assertEqual(p.z[1:3, 2].tolist(), [410, 420])
+        polys = p.vectorize_isobands(levels)
+        self.assertEqual(sorted(tuple(poly.exterior.coords)
+                                for poly in polys),
+                         sorted(tuple(poly.exterior.coords) for poly in ref))
+        polys = p.vectorize_isobands(levels, engine='numpy')
+        self.assertAlmostEqual(sum(poly.area for poly in polys), 10000)
+        self.assertEqual(len(p.vectorize_isolines([300, 400])), 2)
+        polys = p.vectorize_isobands(levels, engine='numpy', stitch=True)
+        self.assertAlmostEqual(sum(poly.area for poly in polys), 10000)
+        self.assertEqual([poly.wkt for poly in polys],
+                         [poly.wkt for poly in p.iter_isobands(
+                             levels, engine='numpy', stitch=True)])
+        p.read_raster('test/data/raster.tif')
+        self.assertIsNone(p._tilesize(False))
+        with self.assertRaises(ValueError):
+            p.read_raster('test/data/raster.tif', band=2, stream=True)
+
+    def test_read_raster_stream_tiles(self):
+        z = numpy.arange(40 * 24, dtype=numpy.float32).reshape(40, 24)
+        fn = tempfile.NamedTemporaryFile(suffix='.tif').name
+        with rasterio.open(fn, 'w', driver='GTiff', width=24, height=40,
+                           count=1, dtype='float32', tiled=True,
+                           blockxsize=16, blockysize=16) as rst:
+            rst.write(z, 1)
+        levels = [100, 300, 500, 700]
+        p = pygonize.Pygonize(tilesize=16)
+        p.read_raster(fn)
+        ref = p.vectorize_isobands(levels, engine='numpy')
+        p.read_raster(fn, stream=True)
+        windows, read = list(), rasterio.io.DatasetReader.read
+
+        def read_window(rst, *args, **kwargs):
+            windows.append(kwargs['window'].flatten())
+            return read(rst, *args, **kwargs)
+
+        with mock.patch('rasterio.open', side_effect=rasterio.open) as m, \
+                mock.patch.object(rasterio.io.DatasetReader, 'read',
+                                  read_window):
+            polys = p.vectorize_isobands(levels, engine='numpy')
+        self.assertEqual(m.call_count, 1)  # file kept open for the tiles
+        self.assertEqual(len(windows), 6)  # one window by tile
+        self.assertEqual([windows[0], windows[-1]],
+                         [(0, 0, 17, 17), (16, 32, 8, 8)])
+        self.assertEqual(sorted(poly.wkt for poly in polys),
+                         sorted(poly.wkt for poly in ref))
+
+    def test_vectorize_isobands_missing(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        z = numpy.ma.masked_array(p.z, numpy.zeros(p.z.shape, dtype=bool))
+        z[:, 3:] = numpy.ma.masked
+        p.read_array(p.lx, p.ly, z)
+        self.assertEqual(p.z.dtype, numpy.float32)
+        self.assertTrue(numpy.isnan(p.z[:, 3:]).all())
+        for tilesize in (None, 2):
+            p.tilesize = tilesize
+            for engine in ('square', 'numpy'):
+                polys = p.vectorize_isobands(levels, engine=engine)
+                self.assertAlmostEqual(sum(poly.area for poly in polys),
+                                       8 * 25 * 25)
+
+        fn = tempfile.NamedTemporaryFile(suffix='.tif').name
+        with rasterio.open(fn, 'w', driver='GTiff', width=5, height=5,
+                           count=1, dtype='int16', nodata=-1) as rst:
+            rst.write(numpy.where(z.mask, -1, z.data).astype('int16'), 1)
+        for stream in (False, True):
+            p = pygonize.Pygonize()
+            p.read_raster(fn, stream=stream)
+            self.assertEqual(p.z[:, :].dtype, numpy.int16)
+            self.assertEqual(p.nodata, -1)
+            self.assertEqual((p.z[:, :] == -1).tolist(), z.mask.tolist())
+            for tilesize in (None, 2):
+                p.tilesize = tilesize
+                for engine in ('square', 'numpy'):
+                    polys = p.vectorize_isobands(levels, engine=engine)
+                    self.assertAlmostEqual(
+                        sum(poly.area for poly in polys), 8)
+            p.tilesize = None
+            polys = p.vectorize_isobands(levels, engine='numpy', stitch=True)
+            self.assertAlmostEqual(sum(poly.area for poly in polys), 8)
+
+        data = numpy.where(z.mask, -1, z.data)
+        for dtype in ('int16', 'float32'):
+            p = pygonize.Pygonize()
+            p.read_array(numpy.arange(5.), numpy.arange(5.),
+                         data.astype(dtype), nodata=-1)
+            self.assertEqual(p.z.dtype, dtype)
+            self.assertEqual(p.nodata, -1 if dtype == 'int16' else None)
+            polys = p.vectorize_isobands(levels, engine='numpy')
+            self.assertAlmostEqual(sum(poly.area for poly in polys), 8)
+
+    def test_vectorize_isobands_pool(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        with pygonize.Pygonize(processes=2) as p:
+            pool = p._pool
+            self.assertIsNotNone(pool)
+            p.read_raster('test/data/raster.tif')
+            for i in range(2):
+                polys = p.vectorize_isobands(levels)
+                self.valid_with_file(polys,
+                                     'test/data/isoband_from_raster_1.txt')
+            self.assertIs(p._pool, pool)  # same pool for all the calls
+        self.assertIsNone(p._pool)
+
+    def test_vectorize_isobands_executor(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        pool = pygonize.pygonize.create_pool(2)
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            for e in (pool, executor):
+                with pygonize.Pygonize(executor=e) as p:
+                    self.assertIsNone(p._pool)
+                    p.read_raster('test/data/raster.tif')
+                    polys = p.vectorize_isobands(levels)
+                    self.valid_with_file(
+                        polys, 'test/data/isoband_from_raster_1.txt')
+        pool.apply(sum, ([1, 2], ))  # external pool not stopped
+        pool.close()
+        pool.join()
+
+    @unittest.skipUnless(
+        'fork' in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_vectorize_isobands_executor_tracker(self):
+        # workers started before the resource tracker of the main process
+        script = (
+            "import concurrent.futures, multiprocessing, pygonize\n"
+            "ctx = multiprocessing.get_context('fork')\n"
+            "with concurrent.futures.ProcessPoolExecutor(\n"
+            "        2, mp_context=ctx) as executor:\n"
+            "    list(executor.map(abs, range(4)))\n"
+            "    for tilesize in (None, 2):\n"
+            "        p = pygonize.Pygonize(executor=executor,\n"
+            "                              tilesize=tilesize, chunksize=1)\n"
+            "        p.read_raster('test/data/raster.tif')\n"
+            "        print(len(p.vectorize_isobands([200, 300, 400, 500])))\n")
+        out = subprocess.run([sys.executable, '-W', 'ignore::rasterio.errors.'
+                              'NotGeoreferencedWarning', '-c', script],
+                             capture_output=True, text=True)
+        self.assertEqual(out.returncode, 0, out.stderr)
+        self.assertEqual(out.stdout.split(), ['21', '21'])
+        self.assertNotIn('resource_tracker', out.stderr)
+
+    def test_vectorize_isobands_thread_executor(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            for tilesize in (None, 2):
+                p = pygonize.Pygonize(executor=executor, tilesize=tilesize,
+                                      chunksize=1)
+                p.read_raster('test/data/raster.tif')
+                for i in range(5):
+                    polys = p.vectorize_isobands(levels)
+                    self.assertAlmostEqual(sum(poly.area for poly in polys),
+                                           10000)
+        self.assertEqual(pygonize.sharedgrid._created, {})
+        self.assertEqual(pygonize.sharedgrid._attached, {})
+
+    def test_iter_isobands(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        p = pygonize.Pygonize(chunksize=2)
+        p.read_raster('test/data/raster.tif')
+        polys = p.iter_isobands(levels)
+        self.assertIsInstance(polys, types.GeneratorType)
+        self.valid_with_file(list(polys),
+                             'test/data/isoband_from_raster_1.txt')
+        self.valid_with_file(list(p.iter_isobands(levels, engine='numpy')),
+                             'test/data/isoband_from_raster_1.txt')
+        polys1 = p.vectorize_isobands(levels, engine='numpy', stitch=True)
+        grid_crossings = pygonize.vectorized.grid_crossings
+        with mock.patch('pygonize.vectorized.grid_crossings',
+                        side_effect=grid_crossings) as m:
+            polys2 = list(p.iter_isobands(levels, engine='numpy',
+                                          stitch=True))
+        self.assertEqual(m.call_count, 1)  # once for all the levels
+        self.assertEqual([poly.wkt for poly in polys1],
+                         [poly.wkt for poly in polys2])
+        self.assertEqual([poly.band for poly in polys2],
+                         sorted(poly.band for poly in polys2))
+        with self.assertRaises(ValueError):
+            p.iter_isobands(levels, stitch=True)
+
+        # partial iteration
+        polys = p.iter_isobands(levels)
+        self.assertEqual(next(polys).wkt, p.vectorize_isobands(levels)[0].wkt)
+        polys.close()
+
+    def test_vectorize_isobands_numpy_same_as_square(self):
+        numpy.random.seed(42)
+        p = pygonize.Pygonize()
+        p.read_array(x=numpy.arange(0., 200., 10.),
+                     y=numpy.arange(150., 0., -10.),
+                     z=numpy.random.rand(15, 20))
+        levels = [0.1, 0.3, 0.45, 0.6, 0.9]
+        polys1 = p.vectorize_isobands(levels)
+        polys2 = p.vectorize_isobands(levels, engine='numpy')
+        self.assertEqual(len(polys1), len(polys2))
+        for poly1, poly2 in zip(polys1, polys2):
+            self.valid_poly(poly2, poly1.exterior.coords)
+
+    def test_vectorize_isobands_stitch(self):
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        polys = p.vectorize_isobands(levels, engine='numpy', stitch=True)
+        self.assertEqual(len(polys), 7)
+        self.assertTrue(all(poly.is_valid for poly in polys))
+        self.assertAlmostEqual(sum(poly.area for poly in polys), 10000)
+        with self.assertRaises(ValueError):
+            p.vectorize_isobands(levels, stitch=True)
+
+    def test_vectorize_isobands_band(self):
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        for engine, stitch in (('square', False), ('numpy', False),
+                               ('numpy', True)):
+            polys = p.vectorize_isobands(levels, engine=engine, stitch=stitch)
+            for poly in polys:
+                self.assertEqual(poly.lvlmn, levels[poly.band])
+                self.assertEqual(poly.lvlmx, levels[poly.band + 1])
+                self.assertTrue(poly.lvlmn <= poly.z_min)
+                self.assertTrue(poly.z_max <= poly.lvlmx)
+
+    def test_vectorize_isobands_compact(self):
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        polys = p.vectorize_isobands(levels, engine='numpy')
+        c = p.vectorize_isobands(levels, engine='numpy', compact=True)
+        self.assertEqual(len(c), len(polys))
+        for i in (0, len(c) // 2, -1):
+            self.assertTrue(c[i].equals(polys[i]))
+        self.assertTrue(all(mn <= poly.z_min and poly.z_max <= mx
+                            for poly, mn, mx in zip(c, c.lvlmn, c.lvlmx)))
+
+    def test_vectorize_isobands_float32(self):
+        levels = [200, 250, 300, 350, 400, 450, 500]
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        x, y, z = p.lx, p.ly, p.z + 0.3
+        p.read_array(x, y, z)
+        ref = p.vectorize_isobands(levels, engine='numpy')
+        p = pygonize.Pygonize(dtype=numpy.float32)
+        p.read_array(x, y, z)
+        self.assertEqual(p.z.dtype, numpy.float32)
+        self.assertEqual(p.astype(self.npz).dtype, self.npz.dtype)
+        for tilesize in (None, 2):
+            p.tilesize = tilesize
+            polys = p.vectorize_isobands(levels, engine='numpy', compact=True)
+            self.assertEqual(polys.coords.dtype, numpy.float32)
+            self.assertAlmostEqual(sum(poly.area for poly in polys), 10000,
+                                   delta=0.1)
+            if tilesize is None:
+                self.assertEqual(len(polys), len(ref))
+                for poly, expected in zip(polys, ref):
+                    self.assertLess(abs(numpy.subtract(
+                        poly.exterior.coords,
+                        expected.exterior.coords)).max(), 1e-4)
+
+    def test_check_dtype(self):
+        check_dtype = pygonize.pygonize.check_dtype
+        self.assertIsNone(check_dtype(None))
+        for dtype in (numpy.float32, 'float32', numpy.dtype('float32')):
+            self.assertEqual(check_dtype(dtype), numpy.float32)
+        self.assertEqual(check_dtype(float), numpy.float64)
+        for dtype in (numpy.float16, numpy.int32, 'int16', 'foo', object):
+            with self.assertRaises(ValueError):
+                pygonize.Pygonize(dtype=dtype)
+
+    def test_vectorize_isolines(self):
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        lines = p.vectorize_isolines([450, 250, 350])
+        self.assertEqual(sorted(set(line.level for line in lines)),
+                         [250, 350, 450])
+        self.assertEqual([line.level for line in lines],
+                         sorted(line.level for line in lines))
+        self.assertTrue(all(line.is_valid for line in lines))
+
+    def test_pyramid(self):
+        p = pygonize.Pygonize()
+        p.read_array(x=self.npx, y=self.npy, z=self.npz)
+        pyr = p.pyramid()
+        p.vectorize_isobands([0, 10, 20, 30, 40, 50, 60], engine='numpy')
+        p.vectorize_isobands([40, 45], engine='numpy')
+        self.assertIs(p.pyramid(), pyr)  # reused with other levels
+        p.read_raster('test/data/raster.tif')
+        self.assertIsNot(p.pyramid(), pyr)
+        self.assertIs(p.pyramid().z, p.z)
+
+    def test_vectorize_isobands_unknown_engine(self):
+        p = pygonize.Pygonize()
+        p.read_array(x=self.npx, y=self.npy, z=self.npz)
+        with self.assertRaises(ValueError):
+            p.vectorize_isobands([40, 45], engine='foo')
+
     def test_vectorize_isobands_from_raster_1_export_shapefile(self):
         t = tempfile.NamedTemporaryFile().name  # temporay filename
         p = pygonize.Pygonize()
@@ -284,6 +707,20 @@ class TestPygonize(PygonizeTest):
                 self.assertEqual(s1[i].bbox, s2[i].bbox)
                 self.assertEqual(s1[i].points, s2[i].points)
 
+    def test_vectorize_isobands_from_raster_1_export_shapefile_stitch(self):
+        t = tempfile.NamedTemporaryFile().name  # temporay filename
+        p = pygonize.Pygonize()
+        p.read_raster('test/data/raster.tif')
+        p.write_shapefile([200, 250, 300, 350, 400, 450, 500], t,
+                          engine='numpy', stitch=True)
+        with open('{}.shp'.format(t), 'rb') as fshp, \
+                open('{}.dbf'.format(t), 'rb') as fdbf:
+            f = shapefile.Reader(shp=fshp, dbf=fdbf)
+            self.assertEqual(len(f.shapes()), 7)
+            self.assertEqual([r[1:] for r in f.records()],
+                             [[200, 250], [250, 300], [300, 350], [350, 400],
+                              [400, 450], [450, 500], [450, 500]])
+
 
 if __name__ == '__main__':
     unittest.main()
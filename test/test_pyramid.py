@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Test of the min/max pyramid."""
+
+import sys
+sys.path.append('../pygonize')
+import unittest
+import numpy
+from shapely.ops import unary_union
+from pygonize import pyramid, vectorized
+from test_base_class import PygonizeTest
+
+
+class TestPyramid(PygonizeTest):
+    """Test of ``pyramid`` module."""
+
+    def setUp(self):
+        """Define a grid with a plateau."""
+        self.z = numpy.full((7, 9), 10.)
+        self.z[0, :3] = [50, 40, 20]
+        self.z[5:, 6:] = 35
+        self.x = numpy.arange(9) * 2.
+        self.y = numpy.arange(7)[::-1] * 4.
+
+    def test_reduce_blocks(self):
+        """Test of ``reduce_blocks``."""
+        a = numpy.arange(15).reshape(3, 5)
+        zmin, zmax = pyramid.reduce_blocks(a, a)
+        self.assertEqual(zmin.tolist(), [[0, 2, 4], [10, 12, 14]])
+        self.assertEqual(zmax.tolist(), [[6, 8, 9], [11, 13, 14]])
+
+        # missing cells
+        a = numpy.where(a % 4 == 0, numpy.nan, a)
+        a[:, 4] = numpy.nan
+        zmin, zmax = pyramid.reduce_blocks(a, a)
+        self.assertEqual(numpy.isnan(zmin).tolist(),
+                         [[False, False, True], [False, False, True]])
+        self.assertEqual(zmin[:, :2].tolist(), [[1, 2], [10, 13]])
+        self.assertEqual(numpy.isnan(zmax).tolist(),
+                         [[True, True, True], [False, True, True]])
+
+    def test_pyramid(self):
+        """Test of the levels of ``Pyramid``."""
+        p = pyramid.Pyramid(self.z)
+        self.assertEqual(p.shape, (6, 8))
+        self.assertEqual([a.shape for a in p.zmin],
+                         [(6, 8), (3, 4), (2, 2), (1, 1)])
+        self.assertEqual(p.zmin[-1].tolist(), [[10]])
+        self.assertEqual(p.zmax[-1].tolist(), [[50]])
+        rectangles, squares, bands = pyramid.Pyramid(self.z[:1]).isobands(
+            [0, 100])
+        self.assertEqual(len(rectangles[0]) + len(squares) + len(bands), 0)
+
+    def test_isobands(self):
+        """Test of ``Pyramid.isobands``."""
+        p = pyramid.Pyramid(self.z)
+        rectangles, squares, bands = p.isobands([0, 15, 30])
+        self.assertEqual(numpy.stack(rectangles, axis=-1).tolist(),
+                         [[0, 4, 4, 8, 0], [4, 6, 0, 4, 0], [2, 4, 0, 2, 0],
+                          [2, 4, 2, 4, 0]])
+        self.assertEqual(squares.tolist(), [0, 0, 1, 1, 2, 2, 3, 8, 9, 10, 11,
+                                            36, 37, 37, 38, 38, 39, 39, 44,
+                                            45, 45])
+        self.assertEqual(bands.tolist(), [0, 1, 0, 1, 0, 1, 0, 0, 0, 0, 0,
+                                          0, 0, 1, 0, 1, 0, 1, 0, 0, 1])
+
+        # levels outside the data
+        rectangles, squares, bands = p.isobands([100, 200])
+        self.assertEqual(len(rectangles[0]) + len(squares), 0)
+
+    def test_window(self):
+        """Test of ``Pyramid.window``."""
+        p = pyramid.Pyramid(self.z)
+        rectangles, squares, bands = p.window(3, 6, 1, 7).isobands([0, 15, 30])
+        self.assertEqual(numpy.stack(rectangles, axis=-1).tolist(),
+                         [[0, 1, 3, 6, 0], [1, 3, 0, 3, 0], [0, 1, 0, 1, 0],
+                          [0, 1, 1, 3, 0]])
+        self.assertEqual(squares.tolist(), [9, 10, 10, 11, 11, 15, 16, 16])
+        self.assertEqual(bands.tolist(), [0, 0, 1, 0, 1, 0, 0, 1])
+
+        # same isobands than without pyramid
+        levels = [0, 15, 30, 45]
+        x, y, z = self.x[1:8], self.y[3:7], self.z[3:7, 1:8]
+        polys1 = vectorized.vectorize_isobands(x, y, z, levels)
+        polys2 = vectorized.vectorize_isobands(x, y, z, levels,
+                                               pyramid=p.window(3, 6, 1, 7))
+        self.assertAlmostEqual(unary_union(polys1).symmetric_difference(
+            unary_union(polys2)).area, 0)
+
+    def test_vectorize_isobands(self):
+        """Same isobands with and without pyramid."""
+        p = pyramid.Pyramid(self.z)
+        levels = [0, 15, 30, 45]
+        for stitch in (False, True):
+            polys1 = vectorized.vectorize_isobands(self.x, self.y, self.z,
+                                                   levels, stitch=stitch)
+            polys2 = vectorized.vectorize_isobands(self.x, self.y, self.z,
+                                                   levels, stitch=stitch,
+                                                   pyramid=p)
+            if not stitch:
+                self.assertLess(len(polys2), len(polys1))
+            self.assertAlmostEqual(unary_union(polys1).symmetric_difference(
+                unary_union(polys2)).area, 0)
+        self.assertEqual(len(polys1), len(polys2))
+        for poly1, poly2 in zip(polys1, polys2):
+            self.assertTrue(poly2.is_valid)
+            self.assertAlmostEqual(poly1.area, poly2.area)
+
+    def test_missing(self):
+        """Same isobands with and without pyramid, with missing values."""
+        self.z[:3, 5:] = numpy.nan
+        self.z[6, 0] = numpy.nan
+        p = pyramid.Pyramid(self.z)
+        levels = [0, 15, 30, 45, 100]
+        for stitch in (False, True):
+            polys1 = vectorized.vectorize_isobands(self.x, self.y, self.z,
+                                                   levels, stitch=stitch)
+            polys2 = vectorized.vectorize_isobands(self.x, self.y, self.z,
+                                                   levels, stitch=stitch,
+                                                   pyramid=p)
+            self.assertAlmostEqual(unary_union(polys1).area, 16 * 24 - 13 * 8)
+            self.assertAlmostEqual(unary_union(polys1).symmetric_difference(
+                unary_union(polys2)).area, 0)
+        rectangles, squares, bands = pyramid.Pyramid(
+            numpy.full((5, 5), numpy.nan)).isobands(levels)
+        self.assertEqual(len(rectangles[0]) + len(squares), 0)
+
+    def test_nodata(self):
+        """Same isobands with and without pyramid, with integer nodata."""
+        z = self.z.astype(numpy.int16)
+        z[:3, 5:] = -1
+        z[6, 0] = -1
+        p = pyramid.Pyramid(z, nodata=-1)
+        self.assertEqual(p.zmin[0].dtype, numpy.int16)
+        self.assertEqual(pyramid.reduce_missing(p.missing[0]).tolist(),
+                         p.missing[1].tolist())
+        levels = [0, 15, 30, 45, 100]
+        polys1 = vectorized.vectorize_isobands(self.x, self.y, z, levels,
+                                               nodata=-1)
+        polys2 = vectorized.vectorize_isobands(self.x, self.y, z, levels,
+                                               pyramid=p, nodata=-1)
+        self.assertAlmostEqual(unary_union(polys1).area, 16 * 24 - 13 * 8)
+        self.assertAlmostEqual(unary_union(polys1).symmetric_difference(
+            unary_union(polys2)).area, 0)
+
+    def test_reduce_missing(self):
+        """Test of ``reduce_missing``."""
+        missing = numpy.zeros((3, 5), dtype=bool)
+        missing[0, 1] = missing[2, 4] = True
+        self.assertEqual(pyramid.reduce_missing(missing).tolist(),
+                         [[True, False, False], [False, False, True]])
+
+
+if __name__ == '__main__':
+    unittest.main()
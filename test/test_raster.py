@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Test of the band of a raster file read window by window."""
+
+import sys
+sys.path.append('../pygonize')
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy
+import rasterio
+from pygonize.raster import RasterBand, axis_index, integer_nodata, \
+    masked_to_nan
+from test_base_class import PygonizeTest
+
+
+class TestRasterBand(PygonizeTest):
+    """Test of ``raster`` module."""
+
+    def setUp(self):
+        """Write a tiled raster with two bands."""
+        self.z = numpy.arange(2 * 40 * 24, dtype=numpy.float32).reshape(
+            2, 40, 24)
+        self.fn = os.path.join(tempfile.mkdtemp(), 'tiled.tif')
+        with rasterio.open(self.fn, 'w', driver='GTiff', width=24, height=40,
+                           count=2, dtype='float32', tiled=True,
+                           blockxsize=16, blockysize=16) as rst:
+            rst.write(self.z)
+
+    def test_axis_index(self):
+        self.assertEqual(axis_index(slice(1, 7, 2), 5), ([1, 3], False))
+        self.assertEqual(axis_index(-1, 5), ([4], True))
+        with self.assertRaises(IndexError):
+            axis_index(5, 5)
+
+    def test_masked_to_nan(self):
+        z = numpy.arange(4, dtype=numpy.int16).reshape(2, 2)
+        self.assertIs(masked_to_nan(z), z)
+        self.assertEqual(masked_to_nan(numpy.ma.masked_array(z)).dtype,
+                         numpy.int16)
+        out = masked_to_nan(numpy.ma.masked_equal(z, 1))
+        self.assertEqual(out.dtype, numpy.float32)
+        self.assertEqual(numpy.isnan(out).tolist(),
+                         [[False, True], [False, False]])
+
+    def test_integer_nodata(self):
+        int16 = numpy.dtype(numpy.int16)
+        self.assertEqual(integer_nodata(int16, -1.), -1)
+        self.assertIsInstance(integer_nodata(int16, -1.), int)
+        for nodata in (None, 0.5, 40000, numpy.nan):
+            self.assertIsNone(integer_nodata(int16, nodata))
+        self.assertIsNone(integer_nodata(numpy.dtype(numpy.float32), -1))
+
+    def test_band_nodata(self):
+        fn = tempfile.NamedTemporaryFile(suffix='.tif').name
+        with rasterio.open(fn, 'w', driver='GTiff', width=3, height=2,
+                           count=1, dtype='int16', nodata=-9999) as rst:
+            rst.write(numpy.array([[1, -9999, 3], [4, 5, 6]], 'int16'), 1)
+        band = RasterBand(fn)
+        self.assertEqual(band.dtype, numpy.int16)
+        self.assertEqual(band.nodata, -9999)
+        self.assertEqual(band[:, :].dtype, numpy.int16)
+        self.assertEqual(band[0].tolist(), [1, -9999, 3])
+        os.remove(fn)
+
+    def test_band(self):
+        band = RasterBand(self.fn, 2)
+        self.assertEqual(band.shape, (40, 24))
+        self.assertEqual(len(band), 40)
+        self.assertEqual(band.dtype, numpy.float32)
+        self.assertEqual(band.block_shape, (16, 16))
+        self.assertEqual(band.tilesize(), (39, 23))
+        self.assertEqual(band.tilesize(20), (32, 23))
+        self.assertEqual(band.read().tolist(), self.z[1].tolist())
+        self.assertEqual(numpy.asarray(band, dtype=float).dtype, float)
+        with self.assertRaises(ValueError):
+            RasterBand(self.fn, 3)
+
+    def test_open(self):
+        """Test of the file kept open by the context manager."""
+        band = RasterBand(self.fn, 2)
+        with mock.patch('rasterio.open', side_effect=rasterio.open) as m:
+            with band:
+                with band:
+                    self.assertEqual(band[3:20, 15:18].tolist(),
+                                     self.z[1, 3:20, 15:18].tolist())
+                self.assertIsNotNone(band._dataset)
+                self.assertEqual(band[-1].tolist(), self.z[1, -1].tolist())
+            self.assertEqual(m.call_count, 1)  # same dataset for the windows
+            self.assertIsNone(band._dataset)
+            band[1]
+            band[2]
+            self.assertEqual(m.call_count, 3)  # one dataset by window
+
+    def test_window(self):
+        band = RasterBand(self.fn)
+        z = self.z[0]
+        for key in ((slice(3, 20), slice(15, 18)), slice(-5, None), 7,
+                    (7, -2), (slice(None, None, 3), slice(1, 20, 4)),
+                    (slice(30, 1, -7), 4), (slice(5, 5), slice(None))):
+            self.assertEqual(band[key].tolist(), z[key].tolist())
+            self.assertEqual(band[key].shape, z[key].shape)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Test of the grid shared with the workers."""
+
+import sys
+sys.path.append('../pygonize')
+import unittest
+from unittest import mock
+import numpy
+from pygonize import sharedgrid
+from pygonize.pygonize import vectorize_isoband_strip_worker
+from test_base_class import PygonizeTest
+
+
+class TestSharedGrid(PygonizeTest):
+    """Test of ``sharedgrid`` module."""
+
+    def setUp(self):
+        """Define a grid."""
+        self.x = numpy.array([2, 6, 10])
+        self.y = numpy.array([11., 7., 3.])
+        self.z = numpy.array([[50, 40, 20], [45, 42, 35], [46, 47, 45]],
+                             dtype=numpy.float32)
+
+    def test_shared_grid(self):
+        """Test of ``SharedGrid`` and ``attach``."""
+        with sharedgrid.SharedGrid(self.x, self.y, self.z) as grid:
+            name, layout = grid.spec
+            self.assertEqual([shape for dtype, shape, offset in layout],
+                             [(3, ), (3, ), (3, 3)])
+            with sharedgrid.attach(grid.spec) as (x, y, z):
+                self.assertEqual(z.dtype, numpy.float32)
+                self.assertEqual(x.tolist(), self.x.tolist())
+                self.assertEqual(y.tolist(), self.y.tolist())
+                self.assertEqual(z.tolist(), self.z.tolist())
+                self.assertIs(z, grid.arrays[2])  # grid of the process
+            self.assertEqual(sharedgrid._attached, {})
+
+            # block attached by a worker process
+            with mock.patch.dict(sharedgrid._created, clear=True):
+                with sharedgrid.attach(grid.spec) as (x, y, z):
+                    self.assertEqual(z.tolist(), self.z.tolist())
+                    with sharedgrid.attach(grid.spec) as (x2, y2, z2):
+                        self.assertIs(z2, z)  # kept for the running tasks
+                    del x2, y2, z2
+                    self.assertEqual(list(sharedgrid._attached),
+                                     [grid.spec[0]])
+                    del x, y, z
+                self.assertEqual(sharedgrid._attached, {})  # released
+                self.assertEqual(sharedgrid._released, [])
+
+                # arrays still referenced at the end of the task
+                with sharedgrid.attach(grid.spec) as (x, y, z):
+                    pass
+                self.assertEqual(sharedgrid._attached, {})
+                self.assertEqual(len(sharedgrid._released), 1)
+                del x, y, z
+                with sharedgrid.attach(grid.spec) as arrays:
+                    del arrays
+                self.assertEqual(sharedgrid._released, [])  # closed
+
+    def test_strip_worker_release(self):
+        """Test of the block released by a worker after its task."""
+        with sharedgrid.SharedGrid(self.x, self.y, self.z) as grid, \
+                mock.patch.dict(sharedgrid._created, clear=True):
+            polys = vectorize_isoband_strip_worker(grid.spec, 0, 2, [40, 45])
+            self.assertEqual(len(polys), 4)
+            self.assertEqual(sharedgrid._attached, {})
+            self.assertEqual(sharedgrid._released, [])
+
+    def test_strip_worker(self):
+        """Test of ``vectorize_isoband_strip_worker``."""
+        with sharedgrid.SharedGrid(self.x, self.y, self.z) as grid:
+            polys = vectorize_isoband_strip_worker(grid.spec, 1, 2, [40, 45])
+            self.assertEqual(len(polys), 2)
+            self.valid_poly(polys[0],
+                            [[2, 7, 45], [6, 7, 42], [6, 4.6, 45],
+                             [2, 7, 45]])
+            self.assertEqual(
+                vectorize_isoband_strip_worker(grid.spec, 1, 1, [40, 45]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
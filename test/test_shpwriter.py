@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Test of the shapefile writer."""
+
+import sys
+sys.path.append('../pygonize')
+import os
+import tempfile
+import unittest
+import shapefile
+from pygonize.shpwriter import ShapefileWriter
+from test_base_class import PygonizeTest
+
+
+class TestShapefileWriter(PygonizeTest):
+    """Test of ``shpwriter`` module."""
+
+    def setUp(self):
+        """Define polygons and fields."""
+        self.polys = [
+            ([[(0, 0, 10), (0, 2.5, 12), (3, 1, 11), (0, 0, 10)]],
+             (1, '10.5', '12.5')),
+            ([[(5, 5, 20), (5, 9, 22), (9, 9, 21), (9, 5, 20), (5, 5, 20)],
+              [(6, 6, 20), (8, 6, 20), (8, 8, 20)]],  # open hole
+             (2, 20.25, '22')),
+            ([[(-1, 3, -4.5), (-2, 4, 5), (-1, 4, 5)]],
+             (3, '', None))]
+        self.fields = [('id', 'N', 50, 0), ('lvlmn', 'N', 5, 2),
+                       ('lvlmx', 'N', 5, 2), ('name', 'C', 8, 0)]
+        self.dir = tempfile.mkdtemp()
+
+    def read(self, fn):
+        """Content of the files of a shapefile."""
+        out = list()
+        for ext in ('.shp', '.shx', '.dbf'):
+            with open(os.path.join(self.dir, fn + ext), 'rb') as f:
+                out.append(f.read())
+        return out
+
+    def test_same_as_pyshp(self):
+        """Same files than ``shapefile.Writer``."""
+        w = shapefile.Writer(shapeType=shapefile.POLYGON)
+        for field in self.fields:
+            w.field(*field)
+        for parts, record in self.polys:
+            w.poly(parts=[list(part) for part in parts])
+            w.record(*record + ('abc', ))
+        w.save(os.path.join(self.dir, 'pyshp'))
+
+        with ShapefileWriter(os.path.join(self.dir, 'streaming.shp'),
+                             self.fields) as w:
+            for parts, record in self.polys:
+                w.poly(parts, *record + ('abc', ))
+
+        self.assertEqual(self.read('pyshp'), self.read('streaming'))
+
+    def test_empty(self):
+        """Shapefile without polygon."""
+        w = shapefile.Writer(shapeType=shapefile.POLYGON)
+        for field in self.fields:
+            w.field(*field)
+        w.save(os.path.join(self.dir, 'pyshp'))
+        ShapefileWriter(os.path.join(self.dir, 'streaming'),
+                        self.fields).close()
+        self.assertEqual(self.read('pyshp'), self.read('streaming'))
+
+
+if __name__ == '__main__':
+    unittest.main()
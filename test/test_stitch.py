@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Test of the stitching of polygons."""
+
+import sys
+sys.path.append('../pygonize')
+import unittest
+from unittest import mock
+from shapely.geometry import Polygon
+from shapely.geometry.base import BaseGeometry
+from pygonize import stitch
+from test_base_class import PygonizeTest
+
+
+def square(x, y):
+    """Clockwise unit square with the upper-left corner at (x, y)."""
+    return [(x, y, 0), (x + 1, y, 0), (x + 1, y - 1, 0), (x, y - 1, 0)]
+
+
+class TestStitch(PygonizeTest):
+    """Test of ``stitch`` module."""
+
+    def test_signed_area(self):
+        """Test of ``signed_area``."""
+        self.assertEqual(stitch.signed_area(square(0, 0)), -1)
+        self.assertEqual(stitch.signed_area(square(0, 0)[::-1]), 1)
+        self.assertEqual(stitch.signed_area([(0, 0), (1, 0), (2, 0)]), 0)
+
+    def test_boundary_edges(self):
+        """Test of ``boundary_edges``."""
+        nexts = stitch.boundary_edges([square(0, 0), square(1, 0)])
+        edges = [(a, b) for a in nexts for b in nexts[a]]
+        self.assertEqual(len(edges), 6)
+        self.assertNotIn(((1, 0, 0), (1, -1, 0)), edges)
+        self.assertNotIn(((1, -1, 0), (1, 0, 0)), edges)
+
+    def test_split_ring(self):
+        """Test of ``split_ring``."""
+        rings = stitch.split_ring([0, 1, 2, 3, 1, 4])
+        self.assertEqual(rings, [[1, 2, 3], [0, 1, 4]])
+        self.assertEqual(stitch.split_ring([0, 1, 2]), [[0, 1, 2]])
+
+    def test_stitch_polygons(self):
+        """Test of ``stitch_polygons``."""
+        polys = stitch.stitch_polygons([square(0, 0), square(1, 0),
+                                        square(1, -1)])
+        self.assertEqual(len(polys), 1)
+        shell, holes = polys[0]
+        self.assertEqual(len(shell), 8)
+        self.assertEqual(holes, [])
+        self.assertLess(stitch.signed_area(shell), 0)  # clockwise
+
+        # counter-clockwise rings
+        polys = stitch.stitch_polygons([square(0, 0)[::-1], square(1, 0)[::-1],
+                                        square(1, -1)[::-1]], clockwise=False)
+        self.assertEqual(len(polys), 1)
+        self.assertEqual(stitch.signed_area(polys[0][0]), -3)
+
+    def test_stitch_polygons_hole(self):
+        """Test of ``stitch_polygons`` with a hole."""
+        rings = [square(x, -y) for x in range(3) for y in range(3)
+                 if (x, y) != (1, 1)]
+        polys = stitch.stitch_polygons(rings)
+        self.assertEqual(len(polys), 1)
+        shell, holes = polys[0]
+        self.assertEqual(len(holes), 1)
+        self.assertGreater(stitch.signed_area(holes[0]), 0)
+        self.assertEqual(Polygon(shell, holes).area, 8)
+
+        # island inside the hole
+        rings = [square(x, -y) for x in range(7) for y in range(7)
+                 if x in (0, 6) or y in (0, 6) or (x, y) == (3, 3)]
+        polys = sorted(stitch.stitch_polygons(rings),
+                       key=lambda p: -Polygon(p[0]).area)
+        self.assertEqual(len(polys), 2)
+        self.assertEqual([len(holes) for shell, holes in polys], [1, 0])
+        self.assertEqual([Polygon(*p).area for p in polys], [24, 1])
+
+    def test_stitch_polygons_islands(self):
+        """Holes of many islands, tested against the nearby shells only."""
+        rings = [square(x + dx, -y - dy) for x in range(0, 120, 4)
+                 for y in range(0, 120, 4) for dx in range(3)
+                 for dy in range(3) if (dx, dy) != (1, 1)]
+        contains = BaseGeometry.contains
+        with mock.patch.object(BaseGeometry, 'contains', autospec=True,
+                               side_effect=contains) as m:
+            polys = stitch.stitch_polygons(rings)
+        self.assertEqual(len(polys), 900)
+        self.assertTrue(all(len(holes) == 1 for shell, holes in polys))
+        self.assertEqual(m.call_count, 900)
+
+    def test_stitch_polygons_touching(self):
+        """Test of ``stitch_polygons`` with polygons touching at a point."""
+        polys = stitch.stitch_polygons([square(0, 0), square(1, -1)])
+        self.assertEqual(len(polys), 2)
+        for shell, holes in polys:
+            self.assertEqual(len(shell), 4)
+            self.assertEqual(holes, [])
+
+        # hole touching the shell at one point
+        rings = [square(x, -y) for x in range(3) for y in range(3)
+                 if (x, y) not in ((1, 1), (2, 2))]
+        polys = stitch.stitch_polygons(rings)
+        self.assertEqual(len(polys), 1)
+        self.assertEqual(len(polys[0][1]), 1)
+        self.assertTrue(Polygon(*polys[0]).is_valid)
+        self.assertEqual(Polygon(*polys[0]).area, 7)
+
+    def test_join_segments(self):
+        """Test of ``join_segments``."""
+        lines = stitch.join_segments([(1, 2), (0, 1), (2, 3)])
+        self.assertEqual(lines, [[0, 1, 2, 3]])
+        lines = stitch.join_segments([(5, 6), (6, 7), (7, 5), (1, 2)])
+        self.assertEqual(sorted(lines), [[1, 2], [5, 6, 7, 5]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+"""Test of the vectorized Marchings Square algorithm."""
+
+import sys
+sys.path.append('../pygonize')
+import unittest
+import numpy
+from pygonize import marchingsquares, vectorized
+from test_base_class import PygonizeTest
+
+
+class TestVectorized(PygonizeTest):
+    """Test of ``vectorized`` module."""
+
+    def setUp(self):
+        """Define a grid."""
+        self.x = numpy.array([2, 6, 10])
+        self.y = numpy.array([11, 7, 3])
+        self.z = numpy.array([[50, 40, 20], [45, 42, 35], [46, 47, 45]])
+
+    def test_duplicate_squares(self):
+        """Test of ``duplicate_squares``."""
+        zc = vectorized.corners(self.z)
+        self.assertEqual(vectorized.duplicate_squares(zc, 40, 45).tolist(),
+                         [[True, True], [True, True]])
+        self.assertEqual(vectorized.duplicate_squares(zc, 41, 46).tolist(),
+                         [[False, False], [True, False]])
+        self.assertEqual(vectorized.duplicate_squares(zc, 0, 10).tolist(),
+                         [[False, False], [False, False]])
+
+    def test_expand(self):
+        """Test of ``expand``."""
+        owner, value = vectorized.expand(numpy.array([3, 0, 5]),
+                                         numpy.array([2, 0, 3]))
+        self.assertEqual(owner.tolist(), [0, 0, 2, 2, 2])
+        self.assertEqual(value.tolist(), [3, 4, 5, 6, 7])
+
+    def test_level_array(self):
+        """Test of ``level_array``."""
+        int16 = numpy.dtype(numpy.int16)
+        for levels, dtype in (([-5, 0, 20.], int16), ([0, 20.5], float),
+                              ([0, 40000], float), ([], float)):
+            self.assertEqual(vectorized.level_array(levels, int16).dtype,
+                             dtype)
+            self.assertEqual(vectorized.level_array(levels, int16).tolist(),
+                             levels)
+        self.assertEqual(vectorized.level_array([1, 2], float).dtype, float)
+
+    def test_vectorize_isobands_int16(self):
+        """Same isobands from integer data than from floats."""
+        z = numpy.array([[30000, 20000, 20000], [20000, 30000, 20000],
+                         [26000, 24000, 32000]], dtype=numpy.int16)
+        levels = [21000, 25000, 26000, 31000]  # saddles, sums overflow int16
+        polys1 = vectorized.vectorize_isobands(self.x, self.y, z, levels)
+        polys2 = vectorized.vectorize_isobands(self.x, self.y,
+                                               z.astype(float), levels)
+        self.assertEqual([poly.exterior.coords[:] for poly in polys1],
+                         [poly.exterior.coords[:] for poly in polys2])
+        lines1 = vectorized.vectorize_isolines(self.x, self.y, z, levels)
+        lines2 = vectorized.vectorize_isolines(self.x, self.y,
+                                               z.astype(float), levels)
+        self.assertEqual([line.coords[:] for line in lines1],
+                         [line.coords[:] for line in lines2])
+
+    def test_isoband_ranges(self):
+        """Test of ``isoband_ranges``."""
+        first, count = vectorized.isoband_ranges(
+            numpy.array([5, 12, 20, -5, 35, 10]),
+            numpy.array([8, 25, 20, 0, 40, 30]), numpy.array([10, 20, 30]))
+        self.assertEqual(first.tolist(), [0, 0, 1, 0, 2, 0])
+        self.assertEqual(count.tolist(), [0, 2, 0, 0, 0, 2])
+
+    def test_square_limits(self):
+        """Test of ``square_limits``, with missing corners."""
+        z = numpy.array([[1, 2, 3], [4, -1, 6], [7, 8, 9]], dtype=numpy.int16)
+        zmin, zmax = vectorized.square_limits(z)
+        self.assertEqual(zmin.tolist(), [[-1, -1], [-1, -1]])
+        zmin, zmax = vectorized.square_limits(z, nodata=-1)
+        self.assertEqual(zmin.dtype, numpy.int16)
+        self.assertTrue((zmin > zmax).all())  # empty limits
+        z[1, 1] = 5
+        zmin, zmax = vectorized.square_limits(z, nodata=-1)
+        self.assertEqual(zmin.tolist(), [[1, 2], [4, 5]])
+        self.assertEqual(zmax.tolist(), [[5, 6], [8, 9]])
+        first, count = vectorized.isoband_ranges(
+            numpy.array([32767]), numpy.array([-32768]), numpy.array([0, 10]))
+        self.assertEqual(count.tolist(), [0])
+
+    def test_vectorize_isobands_nodata(self):
+        """Same isobands from integer data with nodata than with NaN."""
+        z = numpy.array([[30000, 20000, 20000], [20000, 30000, -1],
+                         [26000, 24000, 32000]], dtype=numpy.int16)
+        levels = [21000, 25000, 26000, 31000]
+        zf = numpy.where(z == -1, numpy.nan, z)
+        for stitch in (False, True):
+            polys1 = vectorized.vectorize_isobands(self.x, self.y, z, levels,
+                                                   stitch=stitch, nodata=-1)
+            polys2 = vectorized.vectorize_isobands(self.x, self.y, zf,
+                                                   levels, stitch=stitch)
+            self.assertEqual([poly.area for poly in polys1],
+                             [poly.area for poly in polys2])
+        lines1 = vectorized.vectorize_isolines(self.x, self.y, z, levels,
+                                               nodata=-1)
+        lines2 = vectorized.vectorize_isolines(self.x, self.y, zf, levels)
+        self.assertEqual([line.coords[:] for line in lines1],
+                         [line.coords[:] for line in lines2])
+
+    def test_isoline_ranges(self):
+        """Test of ``isoline_ranges``."""
+        first, count = vectorized.isoline_ranges(
+            numpy.array([5, 12, 20, -5, 35, 10]),
+            numpy.array([8, 25, 20, 0, 40, 30]), numpy.array([10, 20, 30]))
+        self.assertEqual(first.tolist(), [0, 1, 2, 0, 3, 1])
+        self.assertEqual(count.tolist(), [0, 1, 0, 0, 0, 2])
+
+    def test_edge_crossings(self):
+        """Test of ``edge_crossings``."""
+        levels = numpy.array([40, 45, 50])
+        hx, base = vectorized.edge_crossings(self.x[:-1], self.x[1:],
+                                             self.z[0, :-1], self.z[0, 1:],
+                                             levels)
+        self.valid_list(hx[base[0] + numpy.arange(3)], [6, 4, 2])
+        self.assertEqual(hx[base[1]], 6)
+        self.assertEqual(len(hx), 5)  # 4 points and NaN
+        self.assertTrue(numpy.isnan(hx[-1]))
+
+    def test_shared_vertices(self):
+        """Points on an edge are the same for the two squares."""
+        numpy.random.seed(1)
+        z = numpy.random.rand(2, 3)
+        x, y = numpy.array([0., 0.3, 0.7]), numpy.array([1., 0.])
+        polys = vectorized.vectorize_isobands(x, y, z, [0.2, 0.4, 0.6, 0.8])
+        left = set(p for poly in polys for p in poly.exterior.coords
+                   if p[0] == 0.3)
+        self.assertTrue(all(sum(p in poly.exterior.coords for poly in polys)
+                            >= 2 for p in left))
+
+    def test_vectorize_isobands(self):
+        """Test of ``vectorize_isobands``."""
+        polys = vectorized.vectorize_isobands(self.x, self.y, self.z,
+                                              [0, 10, 20, 30, 40, 50, 60])
+        self.assertEqual(len(polys), 7)
+        self.valid_poly(polys[0],
+                        [[2, 11, 50], [6, 11, 40], [6, 7, 42],
+                         [2, 7, 45], [2, 11, 50]])
+        self.valid_poly(polys[1],
+                        [[8, 11, 30], [10, 11, 20],
+                         [10, 8.33, 30], [8, 11, 30]])
+        self.assertEqual(vectorized.vectorize_isobands(
+            self.x, self.y, self.z, [100, 200]), [])
+
+        # X and Y in any direction: clockwise polygons
+        for x, y in ((self.x[::-1], self.y), (self.x, self.y[::-1])):
+            polys = vectorized.vectorize_isobands(
+                x, y, self.z, [0, 10, 20, 30, 40, 50, 60])
+            self.assertEqual(len(polys), 7)
+            self.assertTrue(all(marchingsquares.is_clockwise(poly)
+                                for poly in polys))
+
+    def test_vectorize_isolines(self):
+        """Test of ``vectorize_isolines``."""
+        lines = vectorized.vectorize_isolines(self.x, self.y, self.z,
+                                              [30, 44])
+        self.assertEqual([line.level for line in lines], [30, 44])
+        self.assertEqual(len(lines[1].coords), 4)
+        self.assertFalse(lines[1].is_closed)
+
+        # cone: closed lines
+        x = numpy.arange(9.)
+        z = -numpy.hypot(*numpy.meshgrid(x - 4, x - 4))
+        lines = vectorized.vectorize_isolines(x, x, z, [-3.5, -1.5])
+        self.assertEqual(len(lines), 2)
+        for line in lines:
+            self.assertTrue(line.is_closed)
+        self.assertLess(lines[1].length, lines[0].length)
+
+
+if __name__ == '__main__':
+    unittest.main()